@@ -10,6 +10,7 @@ const { data } = require('react-router-dom');
 const app = express();
 const PORT = 8080;
 const pythonPath = process.env.PYTHON_PATH || 'python';
+const flaskUrl = process.env.FLASK_URL || 'http://127.0.0.1:5050';
 
 
 const axios = require('axios');
@@ -100,47 +101,10 @@ app.post('/api/speech-recognition', upload.single('audio'), (req, res) => {
 
   console.log('音頻文件信息:', req.file);
 
-  // 呼叫 Python 進行語音辨識
-  const pythonProcess = spawn(pythonPath, [
-    path.join(__dirname, 'speech_recognition', 'speech_to_text.py'),
-    req.file.path
-  ], {
-    env: {
-      ...process.env,
-      PYTHONIOENCODING: 'utf-8'
-    }
-  });
-
-  let result = '';
-  let error = '';
-
-  pythonProcess.stdout.on('data', (data) => {
-    result += data.toString();
-  });
-
-  pythonProcess.stderr.on('data', (data) => {
-    error += data.toString();
-    console.error(`[speech_to_text.py][stderr] ${data}`);
-  });
-
-  pythonProcess.on('close', async (code) => {
-    console.log(`Python 進程退出，代碼: ${code}`);
-
-    // （可選）刪暫存檔
-    try {
-      // fs.unlinkSync(req.file.path);
-    } catch (_) {}
-
-    if (code !== 0) {
-      return res.status(500).json({
-        success: false,
-        message: 'Python 執行失敗',
-        stderr: error
-      });
-    }
-
-    try {
-      const transcription = JSON.parse(result);
+  // 交給 Flask 的常駐 Whisper 服務轉錄（模型只載入一次，見 speech_recognition/transcription_service.py）
+  axios.post(`${flaskUrl}/api/speech-recognition/transcribe`, { path: req.file.path }, { timeout: 90000 })
+    .then(async ({ data: transcription }) => {
+      console.log('轉錄耗時:', transcription.timing);
 
       // 檢查 python 回傳
       if (transcription.success === false || !transcription.text) {
@@ -151,7 +115,7 @@ app.post('/api/speech-recognition', upload.single('audio'), (req, res) => {
       }
 
       // 呼叫 Flask 的翻譯 API
-      const resp = await axios.post('http://127.0.0.1:5050/api/translate-sign', { text: transcription.text }, { timeout: 30000 });
+      const resp = await axios.post(`${flaskUrl}/api/translate-sign`, { text: transcription.text }, { timeout: 30000 });
       const signLanguageText = (resp.data?.signLanguage || '').trim();
 
       return res.status(200).json({
@@ -159,15 +123,22 @@ app.post('/api/speech-recognition', upload.single('audio'), (req, res) => {
         text: transcription.text,
         signLanguage: signLanguageText
       });
-    } catch (e) {
-      console.error('解析結果或翻譯服務失敗:', e, '\n[result raw]=', result);
-      return res.status(500).json({
+    })
+    .catch((e) => {
+      console.error('語音辨識或翻譯服務失敗:', e.message, e.response?.data);
+      // 佇列已滿（503）或逾時（504）原樣轉給前端，讓它可以稍後重試
+      const status = [503, 504].includes(e.response?.status) ? e.response.status : 500;
+      return res.status(status).json({
         success: false,
-        message: '解析結果或翻譯服務失敗',
-        stderr: error
+        message: e.response?.data?.error || '語音辨識或翻譯服務失敗'
       });
-    }
-  });
+    })
+    .finally(() => {
+      // 轉錄結束（成功或失敗）就刪掉 multer 存下的上傳檔，uploads 不會越積越多
+      fs.unlink(req.file.path, (err) => {
+        if (err) console.error('刪除上傳檔失敗:', err.message);
+      });
+    });
 });
 
 // feedback API 端點
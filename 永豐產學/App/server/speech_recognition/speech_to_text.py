@@ -1,10 +1,11 @@
 import whisper
 import opencc
-import sounddevice as sd
 import numpy as np
-import tempfile
 import os
+import io
+from math import gcd
 from scipy.io import wavfile
+from scipy.signal import resample_poly
 import re
 import difflib
 import sys
@@ -55,6 +56,8 @@ class AudioTranscriber:
 
     def record_audio(self, duration=8):
         """錄製指定時長的音頻"""
+        import sounddevice as sd  # 只有麥克風錄音需要；常駐服務不需載入 PortAudio
+
         print(f"開始錄音 {duration} 秒...")
         recording = sd.rec(
             int(duration * self.samplerate),
@@ -66,12 +69,11 @@ class AudioTranscriber:
         print("錄音完成！")
         return recording
 
-    def save_audio(self, recording):
-        """將錄音保存為臨時WAV文件"""
-        temp_file = tempfile.NamedTemporaryFile(suffix='.wav', delete=False)
+    def save_audio(self, recording, path):
+        """將錄音保存為WAV文件（路徑由呼叫端決定並負責；轉錄請直接用 transcribe_array，不需存檔）"""
         try:
-            wavfile.write(temp_file.name, self.samplerate, recording)
-            return temp_file.name
+            wavfile.write(path, self.samplerate, recording)
+            return path
         except Exception as e:
             print(f"保存音頻時發生錯誤: {str(e)}")
             return None
@@ -84,26 +86,78 @@ class AudioTranscriber:
         else:
             return text  # 若未找到對應則保留原句
 
+    def to_waveform(self, samples, samplerate=None):
+        """PCM（int16 / int32 / uint8 / float，單聲道或多聲道）→ Whisper 要的 16kHz 單聲道 float32"""
+        samples = np.asarray(samples)
+        if samples.dtype == np.uint8:
+            samples = (samples.astype(np.float32) - 128.0) / 128.0
+        elif np.issubdtype(samples.dtype, np.integer):
+            samples = samples.astype(np.float32) / float(np.iinfo(samples.dtype).max + 1)
+        else:
+            samples = samples.astype(np.float32)
+        if samples.ndim > 1:
+            samples = samples.mean(axis=1)  # (frames, channels)，與 wavfile / record_audio 相同
+        samplerate = samplerate or self.samplerate
+        if samplerate != self.samplerate:
+            g = gcd(int(samplerate), self.samplerate)
+            samples = resample_poly(samples, self.samplerate // g, int(samplerate) // g).astype(np.float32)
+        return samples
+
+    def decode_wav(self, data):
+        """WAV 檔的 bytes → 16kHz 單聲道 float32（在記憶體內解碼，不寫暫存檔、不呼叫 ffmpeg）"""
+        samplerate, samples = wavfile.read(io.BytesIO(data))
+        return self.to_waveform(samples, samplerate)
+
+    def transcribe_array(self, samples, samplerate=None):
+        """直接轉錄記憶體中的 PCM（例如 record_audio 的結果），回傳格式同 transcribe_audio"""
+        try:
+            return self._transcribe(self.to_waveform(samples, samplerate))
+        except Exception as e:
+            sys.stderr.write(f"轉錄時發生錯誤: {str(e)}\n")
+            return None
+
+    def transcribe_bytes(self, data, samplerate=None, dtype=np.int16):
+        """WAV 檔的 bytes，或沒有檔頭的原始 PCM bytes（預設 16kHz int16）"""
+        try:
+            if data[:4] == b'RIFF':
+                waveform = self.decode_wav(data)
+            else:
+                waveform = self.to_waveform(np.frombuffer(data, dtype=dtype), samplerate)
+            return self._transcribe(waveform)
+        except Exception as e:
+            sys.stderr.write(f"轉錄時發生錯誤: {str(e)}\n")
+            return None
+
     def transcribe_audio(self, audio_file):
         """將音頻轉換為文字，並依據字典轉換為手語語序"""
         try:
-            result = self.model.transcribe(audio_file, language="zh")
-            simplified_text = result["text"]
-            traditional_text = self.converter.convert(simplified_text)
-            # 去除標點符號
-            text_no_punct = re.sub(r'[^\w\s]', '', traditional_text)
-            # 使用字典轉換為手語
-            sign_language_text = self.to_sign_language(text_no_punct)
-            return {
-                "簡體": simplified_text,
-                "繁體": traditional_text,
-                "手語": sign_language_text
-            }
+            # WAV 檔在記憶體內解碼；其他格式才交給 whisper 用 ffmpeg 解碼
+            # （瀏覽器 MediaRecorder 錄的其實是 webm，即使副檔名是 .wav，所以看檔頭而不是副檔名）
+            with open(audio_file, 'rb') as f:
+                data = f.read()
+            if data[:4] == b'RIFF':
+                return self._transcribe(self.decode_wav(data))
+            return self._transcribe(audio_file)
         except Exception as e:
             # 不要使用print輸出錯誤，而是記錄到stderr
             sys.stderr.write(f"轉錄時發生錯誤: {str(e)}\n")
             return None
 
+    def _transcribe(self, audio):
+        """audio 可以是檔案路徑或 16kHz float32 波形"""
+        result = self.model.transcribe(audio, language="zh")
+        simplified_text = result["text"]
+        traditional_text = self.converter.convert(simplified_text)
+        # 去除標點符號
+        text_no_punct = re.sub(r'[^\w\s]', '', traditional_text)
+        # 使用字典轉換為手語
+        sign_language_text = self.to_sign_language(text_no_punct)
+        return {
+            "簡體": simplified_text,
+            "繁體": traditional_text,
+            "手語": sign_language_text
+        }
+
 def main():
     try:
         # 獲取腳本所在的目錄
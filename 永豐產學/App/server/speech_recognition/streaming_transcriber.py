@@ -0,0 +1,293 @@
+"""
+行員麥克風的串流語音辨識（VAD 切句）
+AudioTranscriber.record_audio 固定錄 8 秒才轉錄：短句要白等 8 秒，長句會被切斷。
+
+現在：
+    - 音訊以 30 ms 為一個 frame 餵進來（麥克風 callback 或模擬串流）
+    - 能量式 VAD（EnergyVAD）找出句子的開始與結束：音量高於背景噪音一定幅度才算有聲音
+      （背景噪音開頭先校準，之後以最近幾秒的最低音量持續追蹤），
+      連續靜音 silence_ms 就視為一句結束；超過 max_utterance_s 強制切一句
+    - 每句一結束就交給背景 thread 用 AudioTranscriber.transcribe_array 轉錄（記憶體內，不寫檔）
+    - 講話中每 partial_interval 秒可選擇性地轉錄目前為止的內容（on_partial），轉錄 thread 忙碌時略過
+    - 結果立即交給 on_utterance；CLI 可用 --push 直接 POST 到 Flask 的 /signseq/staff，前端 SSE 馬上收到
+
+用法：
+    python streaming_transcriber.py mic --push http://127.0.0.1:5050/signseq/staff
+    python streaming_transcriber.py simulate ../uploads/*.wav --realtime --partials
+simulate 把錄好的音檔切成小段依序餵入，模擬麥克風串流（uploads 裡的檔案其實是 webm，需要 ffmpeg 解碼）。
+stdout 每個事件一行 JSON，其餘訊息寫到 stderr。
+"""
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+SAMPLERATE = 16000
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+# ==================== VAD ====================
+class EnergyVAD:
+    """
+    以 frame 的 RMS 音量（dBFS）判斷有沒有人在講話；門檻跟著背景噪音自動調整。
+    背景噪音：開頭 calibrate_ms 先量一次（這段不判斷講話），之後取最近 noise_window_s 秒內「低於門檻」的
+    frame 中最小的音量（minimum statistics）——講話時字與字之間的停頓也會更新，講話本身不會把門檻拉高。
+    整個視窗都高於門檻時（背景噪音突然變大，或很長的一句話），門檻只以每秒 noise_rise_db 慢慢上調：
+    持續的冷氣、人聲背景約十秒內會被吸收，正常音量的講話則要數十秒才會受影響（早已超過 max_utterance_s）。
+    """
+    IDLE, SPEAKING = 'idle', 'speaking'
+
+    def __init__(self, frame_ms=30, margin_db=10.0, min_db=-45.0, start_ms=90, silence_ms=600,
+                 calibrate_ms=300, noise_window_s=3.0, noise_rise_db=1.0):
+        self.frame_ms = frame_ms
+        self.margin_db = margin_db        # 高於背景噪音多少 dB 算有聲音
+        self.min_db = min_db              # 絕對下限，避免安靜環境把呼吸聲當成講話
+        self.start_frames = max(1, start_ms // frame_ms)
+        self.end_frames = max(1, silence_ms // frame_ms)
+        self.calibrate_frames = max(1, calibrate_ms // frame_ms)
+        self.noise_rise_db = noise_rise_db
+        self._levels = deque(maxlen=max(self.calibrate_frames, int(noise_window_s * 1000 / frame_ms)))  # (音量, 是否有聲音)
+        self._calibrating = self.calibrate_frames
+        self.noise_db = -60.0
+        self.reset()
+
+    def reset(self):
+        self.state = self.IDLE
+        self._voiced = 0
+        self._silent = 0
+
+    def threshold(self):
+        return max(self.noise_db + self.margin_db, self.min_db)
+
+    def process(self, frame):
+        """回傳 'start'、'end' 或 None。"""
+        level = 20.0 * np.log10(np.sqrt(np.mean(frame * frame)) + 1e-10)
+        if self._calibrating:
+            self._calibrating -= 1
+            self._levels.append((level, False))
+            self.noise_db = float(np.median([l for l, _ in self._levels]))
+            return None
+        voiced = level > self.threshold()
+        self._levels.append((level, voiced))
+        quiet = [l for l, v in self._levels if not v]
+        if quiet:
+            self.noise_db = min(quiet)
+        elif len(self._levels) == self._levels.maxlen:
+            rise = self.noise_rise_db * self.frame_ms / 1000.0
+            self.noise_db = min(self.noise_db + rise, min(l for l, _ in self._levels))
+        if self.state == self.IDLE:
+            self._voiced = self._voiced + 1 if voiced else 0
+            if self._voiced >= self.start_frames:
+                self.state, self._silent = self.SPEAKING, 0
+                return 'start'
+        else:
+            self._silent = 0 if voiced else self._silent + 1
+            if self._silent >= self.end_frames:
+                self.state, self._voiced = self.IDLE, 0
+                return 'end'
+        return None
+
+
+# ==================== 串流轉錄 ====================
+class StreamingTranscriber:
+    def __init__(self, transcriber, on_utterance, on_partial=None, vad=None, partial_interval=1.0,
+                 preroll_ms=300, min_utterance_ms=300, max_utterance_s=15.0):
+        self.transcriber = transcriber          # AudioTranscriber（需要 to_waveform / transcribe_array）
+        self.on_utterance = on_utterance        # callback(dict)：一句結束後的轉錄結果
+        self.on_partial = on_partial            # callback(dict)：講話中的暫時結果（可為 None）
+        self.vad = vad or EnergyVAD()
+        self.frame_size = SAMPLERATE * self.vad.frame_ms // 1000
+        self.partial_frames = max(1, int(partial_interval * 1000 / self.vad.frame_ms))
+        self.min_frames = min_utterance_ms // self.vad.frame_ms
+        self.max_frames = int(max_utterance_s * 1000 / self.vad.frame_ms)
+        self._pending = np.zeros(0, dtype=np.float32)   # 還不滿一個 frame 的樣本
+        self._preroll = deque(maxlen=max(1, preroll_ms // self.vad.frame_ms))
+        self._utterance = None                  # 講話中時為 frame list
+        self._start_frame = 0
+        self._padding = 0                       # 這句開頭 preroll 的 frame 數（不算講話長度）
+        self._frames = 0                        # 目前為止收到的 frame 數（時間軸）
+        self._next_id = 1
+        self._jobs = queue.Queue()
+        self._worker = threading.Thread(target=self._run, name='streaming-transcriber', daemon=True)
+        self._worker.start()
+
+    # --- 輸入 ---
+    def feed(self, samples, samplerate=None):
+        """餵入任意長度的 PCM（int16 / float32…，samplerate 不是 16kHz 時會重新取樣）。"""
+        audio = np.concatenate([self._pending, self.transcriber.to_waveform(samples, samplerate)])
+        usable = len(audio) - len(audio) % self.frame_size
+        for start in range(0, usable, self.frame_size):
+            self._process_frame(audio[start:start + self.frame_size])
+        self._pending = audio[usable:]
+
+    def _process_frame(self, frame):
+        event = self.vad.process(frame)
+        self._frames += 1
+        if self._utterance is None:
+            self._preroll.append(frame)
+            if event == 'start':
+                # 把觸發前的 preroll 一起放進這句，避免切掉第一個字的開頭
+                self._utterance = list(self._preroll)
+                self._padding = len(self._preroll)
+                self._start_frame = self._frames - self._padding
+                self._preroll.clear()
+            return
+
+        self._utterance.append(frame)
+        if event == 'end':
+            self._close(trailing=self.vad.end_frames)
+        elif len(self._utterance) >= self.max_frames:
+            self._close()
+            self._utterance, self._start_frame, self._padding = [], self._frames, 0  # 還在講話，直接接著下一句
+        elif (self.on_partial is not None and len(self._utterance) % self.partial_frames == 0
+              and self._jobs.empty()):
+            self._jobs.put(('partial', self._next_id, np.concatenate(self._utterance), None))
+
+    def _close(self, trailing=0):
+        frames, self._utterance = self._utterance, None
+        if len(frames) - self._padding - trailing < self.min_frames:
+            return  # 太短（咳嗽、敲桌子）不轉錄
+        meta = {'id': self._next_id,
+                'start_s': self._start_frame * self.vad.frame_ms / 1000.0,
+                'end_s': self._frames * self.vad.frame_ms / 1000.0,
+                'closed_at': time.perf_counter()}
+        self._next_id += 1
+        self._jobs.put(('final', meta['id'], np.concatenate(frames), meta))
+
+    def flush(self):
+        """輸入結束：把還沒結束的句子轉錄完，並等所有結果送出。"""
+        if self._utterance is not None:
+            self._close()
+        self.vad.reset()
+        self._jobs.join()
+
+    # --- 轉錄 ---
+    def _run(self):
+        while True:
+            kind, utterance_id, audio, meta = self._jobs.get()
+            try:
+                result = self.transcriber.transcribe_array(audio)
+                if kind == 'partial':
+                    if result and self.on_partial is not None:
+                        self.on_partial({'id': utterance_id, 'partial': True, 'text': result['繁體']})
+                elif result:
+                    self.on_utterance({
+                        'id': utterance_id, 'partial': False,
+                        'text': result['繁體'], 'signLanguage': result['手語'],
+                        'start_s': meta['start_s'], 'end_s': meta['end_s'],
+                        # 從偵測到句子結束到拿到結果的時間
+                        'latency_ms': (time.perf_counter() - meta['closed_at']) * 1000.0,
+                    })
+            except Exception as e:
+                sys.stderr.write(f"串流轉錄失敗: {e}\n")
+            finally:
+                self._jobs.task_done()
+
+
+# ==================== 輸出 ====================
+def make_emitter(push_url=None, translate=False):
+    """回傳 on_utterance：印出一行 JSON，必要時把手語語序 POST 到 Flask（/signseq/staff）。"""
+    from urllib import parse, request
+
+    translate_sentence = None
+    if translate:
+        from translate_to_sign import translate_sentence
+
+    lock = threading.Lock()
+
+    def emit(event):
+        if not event.get('partial') and translate_sentence is not None:
+            event['signLanguage'] = translate_sentence(event['text'])  # LLM 轉手語語序（失敗時用字典）
+        with lock:
+            print(json.dumps(event, ensure_ascii=False), flush=True)
+        if push_url and not event.get('partial') and event.get('signLanguage'):
+            try:
+                body = parse.urlencode({'result': event['signLanguage']}).encode('utf-8')
+                request.urlopen(push_url, data=body, timeout=5).read()
+            except Exception as e:
+                sys.stderr.write(f"推送手語語序失敗: {e}\n")
+
+    return emit
+
+
+def load_waveform(transcriber, path):
+    """WAV 在記憶體內解碼；其他格式（瀏覽器錄的 webm）交給 whisper 用 ffmpeg 解碼。"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    if data[:4] == b'RIFF':
+        return transcriber.decode_wav(data)
+    import whisper
+
+    return whisper.load_audio(path)
+
+
+def simulate(transcriber, paths, chunk_ms=100, realtime=False, gap_s=1.0, **kwargs):
+    """把音檔當成麥克風串流依序餵入；檔案之間插入 gap_s 秒靜音。"""
+    stream = StreamingTranscriber(transcriber, **kwargs)
+    chunk = SAMPLERATE * chunk_ms // 1000
+    silence = np.zeros(int(SAMPLERATE * gap_s), dtype=np.float32)
+    for path in paths:
+        sys.stderr.write(f"▶ {path}\n")
+        audio = np.concatenate([load_waveform(transcriber, path), silence])
+        for start in range(0, len(audio), chunk):
+            stream.feed(audio[start:start + chunk])
+            if realtime:
+                time.sleep(chunk_ms / 1000.0)
+    stream.flush()
+
+
+def microphone(transcriber, blocksize_ms=30, **kwargs):
+    """從預設麥克風持續收音，Ctrl-C 結束。"""
+    import sounddevice as sd
+
+    stream = StreamingTranscriber(transcriber, **kwargs)
+    blocks = queue.Queue()
+    # audio callback 只負責把資料放進佇列，VAD 與轉錄都不在音訊 thread 裡做
+    with sd.InputStream(samplerate=SAMPLERATE, channels=1, dtype='int16',
+                        blocksize=SAMPLERATE * blocksize_ms // 1000,
+                        callback=lambda indata, frames, t, status: blocks.put(indata.copy())):
+        sys.stderr.write("🎙️ 開始收音（Ctrl-C 結束）\n")
+        try:
+            while True:
+                stream.feed(blocks.get())
+        except KeyboardInterrupt:
+            pass
+    stream.flush()
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="串流語音辨識（VAD 切句）")
+    sub = parser.add_subparsers(dest='cmd', required=True)
+    for name, help_text in (('mic', '從麥克風即時辨識'), ('simulate', '把音檔當成串流餵入（測試用）')):
+        p = sub.add_parser(name, help=help_text)
+        p.add_argument('--push', help='每句的手語語序 POST 到這個網址（例如 http://127.0.0.1:5050/signseq/staff）')
+        p.add_argument('--translate', action='store_true', help='用 LLM（translate_to_sign）轉手語語序，預設查字典')
+        p.add_argument('--partials', action='store_true', help='講話中也輸出暫時的辨識結果')
+        p.add_argument('--silence-ms', type=int, default=600, help='靜音多久算一句結束')
+        if name == 'simulate':
+            p.add_argument('files', nargs='+')
+            p.add_argument('--realtime', action='store_true', help='依實際時間速度餵入')
+            p.add_argument('--chunk-ms', type=int, default=100)
+
+    args = parser.parse_args(argv)
+    from speech_to_text import AudioTranscriber
+
+    transcriber = AudioTranscriber(os.path.join(SCRIPT_DIR, 'sign_language_dic.txt'))
+    emit = make_emitter(args.push, args.translate)
+    kwargs = {'on_utterance': emit, 'on_partial': emit if args.partials else None,
+              'vad': EnergyVAD(silence_ms=args.silence_ms)}
+    if args.cmd == 'simulate':
+        simulate(transcriber, args.files, args.chunk_ms, args.realtime, **kwargs)
+    else:
+        microphone(transcriber, **kwargs)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
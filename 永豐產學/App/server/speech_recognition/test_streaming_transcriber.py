@@ -0,0 +1,77 @@
+"""
+streaming_transcriber 的 VAD 切句測試（合成音訊，不需要 whisper 模型）
+    python -m pytest test_streaming_transcriber.py
+"""
+import numpy as np
+
+from streaming_transcriber import SAMPLERATE, EnergyVAD, StreamingTranscriber
+
+
+class FakeTranscriber:
+    """只回傳音訊長度，用來檢查切出來的句子。"""
+
+    def to_waveform(self, samples, samplerate=None):
+        return np.asarray(samples, dtype=np.float32)
+
+    def transcribe_array(self, audio):
+        return {"繁體": f"{len(audio) / SAMPLERATE:.2f}s", "手語": ""}
+
+
+def _signal(noise_rms, segments, seed=0, steady=False):
+    """segments 為 (秒數, 語音振幅)；語音以 220 Hz、每秒起伏 3 次的正弦波代替（steady=True 時音量不起伏）。"""
+    rng = np.random.default_rng(seed)
+    parts = []
+    for seconds, amp in segments:
+        n = int(seconds * SAMPLERATE)
+        x = rng.normal(0.0, noise_rms, n)
+        if amp:
+            t = np.arange(n) / SAMPLERATE
+            envelope = 1.0 if steady else 0.6 + 0.4 * np.sin(2 * np.pi * 3 * t)
+            x += amp * np.sin(2 * np.pi * 220 * t) * envelope
+        parts.append(x)
+    return np.concatenate(parts).astype(np.float32)
+
+
+def _utterances(audio, vad=None):
+    results = []
+    streamer = StreamingTranscriber(FakeTranscriber(), results.append, vad=vad)
+    for start in range(0, len(audio), 1600):  # 100 ms 一段，模擬麥克風 callback
+        streamer.feed(audio[start:start + 1600])
+    streamer.flush()
+    return [(r['start_s'], r['end_s']) for r in results]
+
+
+TWO_UTTERANCES = [(1.0, 0), (2.0, 0.3), (1.2, 0), (2.5, 0.3), (1.3, 0)]
+
+
+def test_quiet_room_splits_utterances():
+    spans = _utterances(_signal(0.003, TWO_UTTERANCES))
+    assert len(spans) == 2
+    assert spans[0][1] <= spans[1][0]
+    assert 3.0 < spans[1][0] < 4.2  # 第二句 4.2 秒開始（含 300 ms preroll）
+
+
+def test_steady_noise_above_min_db_splits_utterances():
+    # -34 dBFS 的持續背景噪音高於 min_db（-45）：以前整段被當成一直在講話，兩句合併成一句
+    spans = _utterances(_signal(10 ** (-34 / 20), TWO_UTTERANCES))
+    assert len(spans) == 2
+    assert spans[0][1] <= spans[1][0]
+    assert 3.0 < spans[1][0] < 4.2  # 第二句 4.2 秒開始（含 300 ms preroll）
+
+
+def test_long_utterance_is_not_cut():
+    # 比 noise_window_s（3 秒）還長、中間沒有停頓的一句話不能把背景噪音拉高到講話的音量而被切斷
+    spans = _utterances(_signal(10 ** (-34 / 20), [(1.0, 0), (8.0, 0.3), (1.5, 0)], steady=True))
+    assert len(spans) == 1
+    assert spans[0][0] < 1.0 and spans[0][1] > 9.0
+
+
+def test_noise_floor_tracks_noise_that_starts_mid_stream():
+    vad = EnergyVAD()
+    audio = _signal(0.003, [(1.0, 0)])
+    audio = np.concatenate([audio, _signal(10 ** (-34 / 20), [(12.0, 0)], seed=1)])
+    frame = SAMPLERATE * vad.frame_ms // 1000
+    for start in range(0, len(audio) - frame + 1, frame):
+        vad.process(audio[start:start + frame])
+    assert vad.state == EnergyVAD.IDLE
+    assert abs(vad.noise_db - (-34)) < 3
@@ -0,0 +1,211 @@
+"""
+常駐的 Whisper 轉錄服務
+以前每次上傳音檔，server.js 都 spawn 一次 speech_to_text.py：重新啟動 Python、import torch/whisper、
+whisper.load_model、重建 OpenCC 與手語字典，只為了轉錄幾秒鐘的聲音。
+
+現在模型只載入一次並常駐；請求放進佇列，由單一 worker thread 依序轉錄
+（同一個 whisper 模型不適合多執行緒同時呼叫）。每個結果附上排隊時間與實際運算時間：
+    {"success": true, "text": "...", "signLanguage": "...", "timing": {"queue_ms": ..., "compute_ms": ...}}
+輸出格式與 speech_to_text.py 相同（另加 timing）。
+
+兩種用法：
+    1. app.py 的 POST /api/speech-recognition/transcribe（共用 get_transcription_service()）
+       submit() 可傳檔案路徑、WAV / PCM bytes 或 numpy 陣列；後兩者不寫暫存檔、不經過 ffmpeg
+    2. JSON lines daemon：python transcription_service.py serve
+       stdin 每行 {"id": ..., "path": "音檔路徑"}（或直接一行路徑），stdout 每行一個結果（帶回相同 id）
+
+TRANSCRIBE_MAX_QUEUE：佇列上限（預設 32），滿了直接回傳失敗，不讓請求無限排隊。
+失敗結果帶 code，呼叫端可據此決定是否重試：queue_full / model_unavailable（稍後再試）、timeout、failed。
+"""
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, TimeoutError as FutureTimeout, wait
+
+import numpy as np
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DICTIONARY_PATH = os.path.join(SCRIPT_DIR, 'sign_language_dic.txt')
+MAX_QUEUE = int(os.getenv("TRANSCRIBE_MAX_QUEUE", "32"))
+
+# 失敗結果的 code
+QUEUE_FULL = 'queue_full'
+MODEL_UNAVAILABLE = 'model_unavailable'
+TIMEOUT = 'timeout'
+FAILED = 'failed'
+
+
+def _response(result):
+    """AudioTranscriber.transcribe_audio 的結果 → 與 speech_to_text.py 相同的 JSON 格式。"""
+    if result:
+        return {"success": True, "text": result["繁體"], "signLanguage": result["手語"]}
+    return {"success": False, "error": "轉錄失敗", "code": FAILED}
+
+
+class TranscriptionService:
+    def __init__(self, dictionary_file=DICTIONARY_PATH, max_queue=MAX_QUEUE):
+        self.dictionary_file = dictionary_file
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._transcriber = None
+        self._ready = threading.Event()
+        self._load_error = None
+        self._queue_ms = deque(maxlen=1000)
+        self._compute_ms = deque(maxlen=1000)
+        self._counts = {'ok': 0, 'failed': 0, 'rejected': 0}
+        self._lock = threading.Lock()   # _counts 與延遲統計由 worker 與請求 thread 共同更新
+        self.model_load_ms = None
+        self._thread = threading.Thread(target=self._run, name='transcriber', daemon=True)
+        self._thread.start()
+
+    # ==================== worker ====================
+    def _load(self):
+        from speech_to_text import AudioTranscriber
+
+        t0 = time.perf_counter()
+        try:
+            self._transcriber = AudioTranscriber(self.dictionary_file)
+            self.model_load_ms = (time.perf_counter() - t0) * 1000.0
+            sys.stderr.write(f"✅ Whisper 模型已載入（{self.model_load_ms:.0f} ms）\n")
+        except Exception as e:
+            self._load_error = e
+            sys.stderr.write(f"❌ 無法載入 Whisper 模型: {e}\n")
+        self._ready.set()
+
+    def _run(self):
+        self._load()
+        while True:
+            audio, future, enqueued = self._queue.get()
+            if not future.set_running_or_notify_cancel():
+                continue
+            started = time.perf_counter()
+            if self._transcriber is None:
+                response = {"success": False, "error": f"模型載入失敗: {self._load_error}",
+                            "code": MODEL_UNAVAILABLE}
+            else:
+                response = _response(self._transcribe(audio))
+            finished = time.perf_counter()
+            timing = {'queue_ms': (started - enqueued) * 1000.0, 'compute_ms': (finished - started) * 1000.0}
+            with self._lock:
+                self._queue_ms.append(timing['queue_ms'])
+                self._compute_ms.append(timing['compute_ms'])
+                self._counts['ok' if response['success'] else 'failed'] += 1
+            future.set_result({**response, 'timing': timing})
+
+    def _transcribe(self, audio):
+        # bytes（WAV 或 16kHz int16 PCM）與 numpy 陣列在記憶體內解碼；字串視為檔案路徑
+        if isinstance(audio, (bytes, bytearray)):
+            return self._transcriber.transcribe_bytes(bytes(audio))
+        if isinstance(audio, np.ndarray):
+            return self._transcriber.transcribe_array(audio)
+        return self._transcriber.transcribe_audio(audio)
+
+    # ==================== 對外介面 ====================
+    def submit(self, audio):
+        """放進佇列，回傳 concurrent.futures.Future；佇列已滿時 Future 直接是失敗結果。"""
+        future = Future()
+        try:
+            self._queue.put_nowait((audio, future, time.perf_counter()))
+        except queue.Full:
+            with self._lock:
+                self._counts['rejected'] += 1
+            future.set_result({"success": False, "error": "轉錄佇列已滿，請稍後再試", "code": QUEUE_FULL})
+        return future
+
+    def transcribe(self, audio, timeout=None):
+        """同步介面：等到轉錄完成（或逾時）並回傳結果 dict。"""
+        future = self.submit(audio)
+        try:
+            return future.result(timeout)
+        except FutureTimeout:
+            future.cancel()  # 還在排隊的話就不轉了
+            return {"success": False, "error": "轉錄逾時", "code": TIMEOUT}
+
+    def wait_ready(self, timeout=None):
+        return self._ready.wait(timeout)
+
+    def stats(self):
+        def pct(values, p):
+            values = sorted(values)
+            return values[min(len(values) - 1, int(p * len(values)))] if values else 0.0
+
+        with self._lock:
+            counts = dict(self._counts)
+            queue_ms, compute_ms = list(self._queue_ms), list(self._compute_ms)
+        return {
+            'ready': self._ready.is_set() and self._transcriber is not None,
+            'model_load_ms': self.model_load_ms,
+            'queue_depth': self._queue.qsize(),
+            **counts,
+            'queue_p50_ms': pct(queue_ms, 0.50),
+            'queue_p99_ms': pct(queue_ms, 0.99),
+            'compute_p50_ms': pct(compute_ms, 0.50),
+            'compute_p99_ms': pct(compute_ms, 0.99),
+        }
+
+
+_service = None
+_service_lock = threading.Lock()
+
+
+def get_transcription_service():
+    """process 內共用的服務；第一次呼叫時在背景載入模型。"""
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = TranscriptionService()
+        return _service
+
+
+# ==================== JSON lines daemon ====================
+def serve(stdin=sys.stdin, stdout=sys.stdout):
+    """每行一個請求，結果完成就寫一行（帶回請求的 id）；stdout 只輸出 JSON，其餘訊息寫到 stderr。"""
+    service = get_transcription_service()
+    write_lock = threading.Lock()
+
+    def reply(request_id, response):
+        if request_id is not None:
+            response = {'id': request_id, **response}
+        with write_lock:
+            stdout.write(json.dumps(response, ensure_ascii=False) + '\n')
+            stdout.flush()
+
+    pending = []
+    for line in stdin:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            request = json.loads(line) if line.startswith('{') else {'path': line}
+        except ValueError:
+            reply(None, {"success": False, "error": "無法解析的請求"})
+            continue
+        request_id, path = request.get('id'), request.get('path')
+        if request.get('cmd') == 'stats':
+            reply(request_id, {"success": True, "stats": service.stats()})
+        elif not path:
+            reply(request_id, {"success": False, "error": "未提供音頻檔案路徑"})
+        else:
+            future = service.submit(path)
+            future.add_done_callback(lambda future, request_id=request_id: reply(request_id, future.result()))
+            pending.append(future)
+            pending = [f for f in pending if not f.done()]
+    wait(pending)  # stdin 關閉後把佇列裡的請求做完再結束
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="常駐 Whisper 轉錄服務")
+    sub = parser.add_subparsers(dest='cmd', required=True)
+    sub.add_parser('serve', help='JSON lines daemon（stdin 請求、stdout 結果）')
+
+    parser.parse_args(argv)
+    serve()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,89 +1,99 @@
 import os
 import sys
-import jieba
-from openai import OpenAI
-from sentence_transformers import SentenceTransformer
-from docx import Document
-import faiss
-import numpy as np
-from typing import Dict, List, Tuple
-import re
-from zhconv import convert
-from langdetect import detect
-from deep_translator import GoogleTranslator
+from typing import Dict, Iterator, List
 from dotenv import load_dotenv
 
-# 放在檔案較前面（import 後）
-HAN_SPACE_PUNCT_RE = re.compile('^[\u4e00-\u9fff\\s，。、]+$')
+# 讓單獨執行（CLI）時也找得到專案根目錄的共用模組
+PROJECT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+if PROJECT_DIR not in sys.path:
+    sys.path.append(PROJECT_DIR)
 
+from embedding_service import get_corpus_registry
+from llm_client import LLMUnavailable, get_llm_client
+from semantic_cache import get_semantic_cache
+from sign_dictionary import get_sign_dictionary
+from translation_cache import NATURAL_TO_SIGN, get_translation_cache
+from traditional_chinese import StreamingConverter, ensure_traditional_chinese  # 離線、批次的繁體轉換
 
-# === 🔑 設定 OpenRouter (OpenAI) API Key 與參數 ===
-# === 🔑 載入環境變數 ===
+
+# === 🔑 載入環境變數（OPENROUTER_API_KEY）===
 load_dotenv()
-api_key = os.getenv("OPENROUTER_API_KEY")
-base_url = "https://openrouter.ai/api/v1"
-client = OpenAI(api_key=api_key, base_url=base_url)
-
-# === 載入並拆分劇本語料 ===
-def load_corpus_from_docx(file_path: str, max_len: int = 80) -> List[str]:
-    doc = Document(file_path)
-    chunks: List[str] = []
-    for para in doc.paragraphs:
-        text = para.text.strip()
-        if not text:
-            continue
-        words = list(jieba.cut(text))
-        cur: List[str] = []
-        for w in words:
-            cur.append(w)
-            if len("".join(cur)) >= max_len:
-                chunks.append("".join(cur))
-                cur = []
-        if cur:
-            chunks.append("".join(cur))
-    return chunks
-
-# 找到目前檔案所在目錄
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-
-# rag_nlToSign.docx 與 translate_to_sign.py 在同一層的上層資料夾
-DOCX_PATH = os.path.join(BASE_DIR, '..', 'rag_nlToSign.docx')
-
-corpus = load_corpus_from_docx(DOCX_PATH, max_len=80)
-
-# === 建立向量索引 ===
-embedder = SentenceTransformer("shibing624/text2vec-base-chinese")
-corpus_embeddings = embedder.encode(corpus, convert_to_numpy=True)
-dimension = corpus_embeddings.shape[1]
-index = faiss.IndexFlatL2(dimension)
-index.add(corpus_embeddings)
+llm = get_llm_client()  # 共用連線池、有逾時與 circuit breaker（見 llm_client.py）
+LLM_MODEL = "qwen/qwen2.5-vl-72b-instruct"
+translation_cache = get_translation_cache()
+semantic_cache = get_semantic_cache()
+
+# === 語料索引與 embedding 模型由 embedding_service 共用（第一次檢索時才載入）===
+# 語料為 App/server/rag_nlToSign.docx
+CORPUS_NAME = "rag_nlToSign"
+registry = get_corpus_registry()
 
 # === 檢索最相關句子 ===
 def retrieve_relevant_sentences(query: str, k: int = 5) -> List[str]:
-    q_emb = embedder.encode([query], convert_to_numpy=True)
-    _, indices = index.search(q_emb, k)
-    return [corpus[i] for i in indices[0]]
-
-# === 確保繁體中文輸出 ===
-def ensure_traditional_chinese(text: str) -> Tuple[str, List[Dict[str,str]]]:
-    translator = GoogleTranslator(source='auto', target='zh-TW')
-    records: List[Dict[str,str]] = []
-    words = text.split()
-    result: List[str] = []
-    for word in words:
-        # 用預編譯的正則
-        if not HAN_SPACE_PUNCT_RE.match(word):
-            lang = detect(word)
-            if lang not in ('zh-tw','zh-cn'):
-                trans = translator.translate(word)
-                records.append({'original': word, 'translated': trans, 'detected_lang': lang})
-                word = trans
-        word = convert(word, 'zh-hant')
-        result.append(word)
-    return ' '.join(result), records
+    # cosine 相似度低於門檻（RAG_MIN_SIMILARITY）的句子不放進提示詞
+    return [chunk for chunk, _ in registry.search(CORPUS_NAME, query, k)]
+
+def retrieve_many(queries: List[str], k: int = 5) -> List[List[str]]:
+    # 多筆查詢一起 encode（快取命中的不重算）
+    return [[chunk for chunk, _ in hits] for hits in registry.retrieve_many(CORPUS_NAME, queries, k)]
 
 # === 轉手語主流程 ===
-def translate_sentence(user_message: str) -> str:
+def translate_sentence(user_message: str, fallback: bool = True) -> str:
+    # 相同輸入（同模型、同語料版本）直接回傳快取的翻譯；
+    # 否則與預先翻譯好的劇本句子夠相近時沿用其翻譯，都沒有才呼叫 LLM
+    try:
+        return translation_cache.get_or_compute(
+            NATURAL_TO_SIGN, user_message, LLM_MODEL, registry.version(CORPUS_NAME),
+            lambda: semantic_cache.lookup(NATURAL_TO_SIGN, user_message, LLM_MODEL) or _translate_sentence(user_message))
+    except LLMUnavailable as e:
+        if not fallback:  # 批次翻譯：失敗就丟出，之後續跑時重試
+            raise
+        # LLM 逾時或暫停使用：與 AudioTranscriber.to_sign_language 相同的字典比對（降級結果不寫入快取）
+        print(f"⚠️ LLM 無法使用，改用字典翻譯: {e}")
+        return get_sign_dictionary().to_sign_language(user_message)
+
+def translate_sentence_stream(user_message: str, fallback: bool = True) -> Iterator[str]:
+    """串流版：LLM 產生一段就 yield 一段手語語序；完整結果同樣寫入翻譯快取。"""
+    sent = False
+    try:
+        for piece in translation_cache.get_or_stream(
+                NATURAL_TO_SIGN, user_message, LLM_MODEL, registry.version(CORPUS_NAME),
+                lambda: _stream_sentence(user_message)):
+            sent = True
+            yield piece
+    except LLMUnavailable as e:
+        if sent or not fallback:
+            raise  # 已經送出部分內容：讓呼叫端知道結果不完整（SSE 送 event: error）
+        print(f"⚠️ LLM 無法使用，改用字典翻譯: {e}")
+        yield get_sign_dictionary().to_sign_language(user_message)
+
+def _stream_sentence(user_message: str) -> Iterator[str]:
+    cached = semantic_cache.lookup(NATURAL_TO_SIGN, user_message, LLM_MODEL)
+    if cached:
+        yield cached
+        return
+    converter = StreamingConverter()  # 每段都先轉成繁體再送出
+    for delta in llm.stream(LLM_MODEL, build_messages(user_message)):
+        piece = converter.feed(delta)
+        if piece:
+            yield piece
+    rest = converter.flush()
+    if rest:
+        yield rest
+    if converter.records:
+        yield _format_notes(converter.records)
+
+def _translate_sentence(user_message: str) -> str:
+    bot_reply = llm.complete(LLM_MODEL, build_messages(user_message))
+    converted, notes = ensure_traditional_chinese(bot_reply)
+    if notes:
+        converted += _format_notes(notes)
+    return converted
+
+def _format_notes(notes: List[Dict[str, str]]) -> str:
+    return "\n註：已轉為繁體：\n" + "\n".join(f"- {n['original']}→{n['translated']}" for n in notes)
+
+def build_messages(user_message: str) -> List[Dict[str, str]]:
     related = retrieve_relevant_sentences(user_message)
     context = "\n".join(f"- {s}" for s in related)
     system_prompt = f"""
@@ -109,20 +119,10 @@ def translate_sentence(user_message: str) -> str:
 ---
 請將下列自然語序中文句子，轉換為手語語序：
 """
-    messages = [
+    return [
         {"role": "system", "content": system_prompt},
         {"role": "user",   "content": user_message}
     ]
-    resp = client.chat.completions.create(
-        model="qwen/qwen2.5-vl-72b-instruct",
-        messages=messages
-    )
-    bot_reply = resp.choices[0].message.content.strip()
-    converted, notes = ensure_traditional_chinese(bot_reply)
-    if notes:
-        note_txt = "\n註：已轉為繁體：\n" + "\n".join(f"- {n['original']}→{n['translated']}" for n in notes)
-        converted += note_txt
-    return converted
 
 # === CLI 介面 ===
 if __name__ == "__main__":
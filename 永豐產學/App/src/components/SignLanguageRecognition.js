@@ -76,7 +76,7 @@ const SignLanguageRecognition = () => {
   // const resultBoxRef = useRef(null);
   const editMessageID = useLocation().state?.messageID || null;
 
-  // 1) 每秒向後端拉一次「原始手語語序」
+  // 1) 後端推送的「原始手語語序」
   const [rawSentence, setRawSentence] = useState('');
 
   // 設置初始辨識狀態
@@ -84,27 +84,53 @@ const SignLanguageRecognition = () => {
     setIsRecording(true);
   }, []);
 
-  // 修改：加快輪詢頻率以達成「即時」效果
+  // 訂閱後端 SSE：有新詞立即推送；瀏覽器不支援或連線失敗時退回輪詢
   useEffect(() => {
-    const iv = setInterval(async () => {
-      try {
-        const res = await fetch('http://localhost:5050/handlanRes', { 
-            method: 'GET',
-            mode: 'cors',
-            credentials: 'include'
-        });
-        const data = await res.json();
-        
-        // 只有當後端有傳回新的非空字串時才更新
+    let iv = null;
+    let source = null;
+
+    const startPolling = () => {
+      if (iv) return;
+      iv = setInterval(async () => {
+        try {
+          const res = await fetch('http://localhost:5050/handlanRes', { 
+              method: 'GET',
+              mode: 'cors',
+              credentials: 'include'
+          });
+          const data = await res.json();
+          
+          // 只有當後端有傳回新的非空字串時才更新
+          if (data.msg && data.msg.trim() !== '') {
+            setRawSentence(data.msg);
+          }
+        } catch (err) {
+          console.error('拉取手語語序失敗', err);
+        }
+      }, 500); // 0.5秒更新
+    };
+
+    if (typeof EventSource !== 'undefined') {
+      source = new EventSource('http://localhost:5050/handlanRes/stream', { withCredentials: true });
+      source.addEventListener('handlanRes', (e) => {
+        const data = JSON.parse(e.data);
         if (data.msg && data.msg.trim() !== '') {
           setRawSentence(data.msg);
         }
-      } catch (err) {
-        console.error('拉取手語語序失敗', err);
-      }
-    }, 500); // 0.5秒更新
+      });
+      source.onerror = () => {
+        console.error('手語語序串流中斷，改用輪詢');
+        source.close();
+        startPolling();
+      };
+    } else {
+      startPolling();
+    }
 
-    return () => clearInterval(iv);
+    return () => {
+      if (source) source.close();
+      if (iv) clearInterval(iv);
+    };
   }, []);
   
   // === 2. 新增：轉換 helper (顯示中文用) ===
@@ -8,24 +8,129 @@ from flask_cors import cross_origin
 import numpy as np  # 引入 NumPy 模組
 from PIL import Image
 import io
+import json
+import tempfile
 from Train_Model_hands2 import start
+from model_registry import get_sign_model
+from camera_broadcaster import get_broadcaster
+from landmark_wire import decode_frames, max_payload_bytes, WireFormatError
+from recognition_sessions import SessionManager
+from event_bus import get_event_bus, SIGN_RESULT, STAFF_SIGN_SEQ
+from message_log import DEFAULT_SESSION
+from state_store import create_state_store, sse_stream
+from embedding_service import get_corpus_registry, get_embedding_service
+from translation_cache import get_translation_cache
+from semantic_cache import get_semantic_cache
+from llm_client import get_llm_client
+from speculative_translation import SpeculativeTranslator
+from batch_translate import DIRECTIONS, translate_many
 import threading
-from llm_translate_to_natural import translate_to_natural  # 或你的實際路徑
+from llm_translate_to_natural import translate_to_natural, translate_to_natural_stream  # 或你的實際路徑
 
 # 讓 Flask 找得到 speech_recognition 模組
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 sys.path.append(os.path.join(BASE_DIR, 'App', 'server', 'speech_recognition'))
 
-from translate_to_sign import translate_sentence  # 直接匯入你的主函式
+from translate_to_sign import translate_sentence, translate_sentence_stream  # 直接匯入你的主函式
+from transcription_service import MODEL_UNAVAILABLE, QUEUE_FULL, TIMEOUT, get_transcription_service
 
 
 app = Flask(__name__)
 CORS(app, origins="http://localhost:3000", supports_credentials=True)
+app.config['UPLOAD_FOLDER'] = 'uploads'
+# 所有請求本體的上限（音檔上傳、PCM、關節點封包）；超過時 Flask 直接回 413，不會整個讀進記憶體
+app.config['MAX_CONTENT_LENGTH'] = int(os.getenv("MAX_UPLOAD_MB", "25")) * 1024 * 1024
 outputFrame = None
-lock = threading.Lock()
-trans_res = None
-staff_sign_seq = None  # 專門存語音→手語語序（staff 的）
-natural_language_result = None
+
+# === 對話狀態（各頻道的 per-session 訊息紀錄、舊版輪詢 cursor、LLM 結果）===
+# 預設存在 process 記憶體；設 SIGN_STATE_STORE=sqlite:////<絕對路徑> 時改存共用的 SQLite 檔（其他狀態仍在各 process 內，見 README）
+# 頻道：SIGN_RESULT 客戶手語辨識出的手語語序；STAFF_SIGN_SEQ 行員語音 → 手語語序
+state_store = create_state_store()
+NATURAL_LANGUAGE_RESULT = 'natural_language_result'
+BATCH_MAX_TEXTS = int(os.getenv("BATCH_MAX_TEXTS", "32"))  # /api/translate/batch 單次最多句數；整份劇本請用 batch_translate.py CLI
+
+# === 事件匯流排：辨識器直接 publish，寫進訊息紀錄後由輪詢 API 與 SSE 串流讀取 ===
+event_bus = get_event_bus()
+
+
+def _log_handler(topic):
+    def handler(event):
+        session_id = event.get('session') or DEFAULT_SESSION
+        state_store.append(topic, session_id, {'msg': event.get('msg') or ""})
+    return handler
+
+
+event_bus.add_handler(SIGN_RESULT, _log_handler(SIGN_RESULT))
+event_bus.add_handler(STAFF_SIGN_SEQ, _log_handler(STAFF_SIGN_SEQ))
+
+# === 推測式翻譯：手語語序每變長一次就先在背景翻譯，/translateSign 直接取用（見 speculative_translation.py）===
+speculator = SpeculativeTranslator(translate_to_natural, translate_to_natural_stream)
+event_bus.add_handler(SIGN_RESULT, lambda event: speculator.submit(event.get('session') or DEFAULT_SESSION,
+                                                                  event.get('msg')))
+
+
+def _read_messages(topic):
+    """
+    GET ?session=<id>&since=<seq>：回傳 seq 之後的所有訊息與新的 cursor
+    GET（不帶 since）：相容舊前端，只回傳尚未讀過的最新一則
+    """
+    session_id = request.args.get('session', DEFAULT_SESSION)
+    since = request.args.get('since', type=int)
+
+    if since is not None:
+        messages, cursor = state_store.read(topic, session_id, since,
+                                            limit=request.args.get('limit', type=int))
+        msg = messages[-1]['msg'] if messages else ""
+        return {"msg": msg, "messages": messages, "cursor": cursor}
+
+    # 沒帶 since 的舊版輪詢：由狀態儲存替它記 cursor，行為仍是「每則只回一次」
+    messages, cursor = state_store.read_unseen(topic, session_id, reader='legacy')
+    msg = messages[-1]['msg'] if messages else ""
+    return {"msg": msg, "cursor": cursor}
+
+
+def _on_session_update(session_id, result):
+    # 前端上傳關節點辨識出新詞時，直接 publish（不需 loopback POST）
+    event_bus.publish(SIGN_RESULT, {'msg': result, 'session': session_id})
+
+
+def _sse_response(topic):
+    # 可用 ?since= 或斷線重連時瀏覽器帶的 Last-Event-ID 續傳
+    session_id = request.args.get('session', DEFAULT_SESSION)
+    since = request.args.get('since', type=int)
+    if since is None:
+        last_id = request.headers.get('Last-Event-ID')
+        since = int(last_id) if last_id and last_id.isdigit() else state_store.last_seq(topic, session_id)
+    stream = sse_stream(state_store, topic, session_id, since, event=topic)
+    response = Response(stream, mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    response.headers.add('Access-Control-Allow-Credentials', 'true')
+    return response
+
+
+def _translation_stream_response(pieces, done):
+    # 翻譯結果逐段以 SSE 送出：event: delta {"text"}，最後 event: done（done(全文) 的內容）
+    def generate():
+        parts = []
+        try:
+            for piece in pieces:
+                parts.append(piece)
+                yield f"event: delta\ndata: {json.dumps({'text': piece}, ensure_ascii=False)}\n\n"
+        except Exception as e:
+            print("串流翻譯失敗：", repr(e))
+            yield f"event: error\ndata: {json.dumps({'message': 'translate failed'})}\n\n"
+            return
+        yield f"event: done\ndata: {json.dumps(done(''.join(parts).strip()), ensure_ascii=False)}\n\n"
+
+    response = Response(generate(), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    response.headers.add('Access-Control-Allow-Credentials', 'true')
+    return response
+
+
+recognition_sessions = SessionManager(get_sign_model, on_update=_on_session_update)
 
 def process_pdf(input_path, output_path, type, level):
     # 打開PDF
@@ -86,26 +191,26 @@ def favicon():
 
 @app.route('/handlanRes', methods=['POST', 'GET'])
 def handle_result():
-    global trans_res
-    
     if request.method == 'POST':
         data = request.form
         result = data.get('result')
-        trans_res = result
+        event_bus.publish(SIGN_RESULT, {'msg': result})
         print('Received result:', result)
         return jsonify({"status": "ok"}) 
     
     elif request.method == 'GET':
-        msg = trans_res if trans_res else ""
-        trans_res = None 
-        print(f"返回手語語序: {msg}")
-        return jsonify({"msg": msg})
+        result = _read_messages(SIGN_RESULT)
+        print(f"返回手語語序: {result['msg']}")
+        return jsonify(result)
+
+# SSE：有新的手語語序就推送 id: <seq> / event: handlanRes / data: {"seq": ..., "msg": "..."}
+@app.route('/handlanRes/stream', methods=['GET'])
+def stream_result():
+    return _sse_response(SIGN_RESULT)
     
 # === 新增：專用 API，避免與 /handlanRes 衝突 ===
 @app.route('/signseq/staff', methods=['POST', 'GET'])
 def handle_staff_signseq():
-    global staff_sign_seq
-
     if request.method == 'POST':
         # 允許 x-www-form-urlencoded 或 JSON 兩種格式
         result = request.form.get('result')
@@ -113,20 +218,24 @@ def handle_staff_signseq():
             data = request.get_json(silent=True) or {}
             result = data.get('result')
 
-        staff_sign_seq = result or ""
-        print('Received STAFF sign sequence:', staff_sign_seq)
+        event_bus.publish(STAFF_SIGN_SEQ, {'msg': result or ""})
+        print('Received STAFF sign sequence:', result or "")
 
         resp = jsonify({"status": "ok"})
         return resp
 
     elif request.method == 'GET':
-        msg = staff_sign_seq or ""
-        staff_sign_seq = None  # 讀一次即清空，避免重播
-        print(f"Return STAFF sign sequence: {msg}")
+        # 不帶 since 時每則只回一次，避免重播
+        result = _read_messages(STAFF_SIGN_SEQ)
+        print(f"Return STAFF sign sequence: {result['msg']}")
 
-        resp = jsonify({"msg": msg})
+        resp = jsonify(result)
         return resp
 
+# SSE：行員語音 → 手語語序，event: staff / data: {"msg": "..."}
+@app.route('/signseq/staff/stream', methods=['GET'])
+def stream_staff_signseq():
+    return _sse_response(STAFF_SIGN_SEQ)
 
 
 # LLM 轉換結果
@@ -135,8 +244,7 @@ def handle_natural_res():
     if request.method == 'POST':
         data = request.form
         result = data.get('result')
-        global natural_language_result
-        natural_language_result = result  # 存儲LLM轉換後的中文結果
+        state_store.set_value(NATURAL_LANGUAGE_RESULT, result)  # 存儲LLM轉換後的中文結果
         print('LLM轉換後的中文結果:', result)
         response = jsonify({"status": "ok"})
         response.headers.add('Access-Control-Allow-Credentials')
@@ -147,19 +255,21 @@ def translate_sign():
     # 從前端取出傳過來的手語句子，如果沒帶就用 last_sign_sentence
     data = request.get_json(silent=True) or {}
     
-    # 2) 優先用前端傳 signSentence；若沒傳再用上次存的 trans_res
+    # 2) 優先用前端傳 signSentence；若沒傳再用最近一次辨識出的手語語序
     sign_sentence = data.get('signSentence')
     print(data)
-    sentence = sign_sentence if sign_sentence else trans_res
+    latest = state_store.latest(SIGN_RESULT, data.get('session') or DEFAULT_SESSION)
+    sentence = sign_sentence if sign_sentence else (latest['msg'] if latest else None)
     print(sentence)
     
     # 3) 若還是拿不到，就回 400 或直接空字串
     if not sentence:
         return jsonify({'msg': ''}), 400
 
-    # 呼叫你的 LLM 翻譯函式
+    # 呼叫你的 LLM 翻譯函式（與推測翻譯的句子相同時直接沿用，還在翻就等它翻完）
     try:
-        natural = translate_to_natural(sentence)
+        natural = speculator.translate_final(data.get('session') or DEFAULT_SESSION, sentence,
+                                             timeout=get_llm_client().timeout + 1.0)
     except Exception as e:
         print("LLM 翻譯失敗：", e)
         return jsonify({'msg': ''}), 500
@@ -169,6 +279,16 @@ def translate_sign():
     response.headers.add('Access-Control-Allow-Credentials', 'true')
     return response
 
+@app.route('/translateSign/stream', methods=['POST'])
+def translate_sign_stream():
+    """與 /translateSign 相同的輸入；回傳 SSE，LLM 產生一段就送一段，最後 event: done {"msg"}。"""
+    data = request.get_json(silent=True) or {}
+    latest = state_store.latest(SIGN_RESULT, data.get('session') or DEFAULT_SESSION)
+    sentence = data.get('signSentence') or (latest['msg'] if latest else None)
+    if not sentence:
+        return jsonify({'msg': ''}), 400
+    return _translation_stream_response(translate_to_natural_stream(sentence), lambda full: {'msg': full})
+
 @app.route('/api/translate-sign', methods=['POST'])
 def api_translate_sign():
     """
@@ -189,6 +309,141 @@ def api_translate_sign():
         print("translate-sign error:", repr(e))
         return jsonify({"success": False, "message": "translate failed"}), 500
 
+@app.route('/api/translate-sign/stream', methods=['POST'])
+def api_translate_sign_stream():
+    """
+    輸入: 與 /api/translate-sign 相同
+    回傳: SSE  event: delta { "text": "片段" } ... event: done { "success": true, "signLanguage": "全文" }
+    """
+    data = request.get_json(silent=True) or {}
+    text = (data.get('text') or request.form.get('text') or '').strip()
+    if not text:
+        return jsonify({"success": False, "message": "text is required"}), 400
+    return _translation_stream_response(translate_sentence_stream(text),
+                                        lambda full: {"success": True, "signLanguage": full})
+
+
+
+# === 語音辨識：常駐的 Whisper 模型與佇列（見 speech_recognition/transcription_service.py）===
+SPEECH_UPLOAD_DIR = os.path.join(BASE_DIR, 'App', 'server', 'uploads')
+TRANSCRIBE_TIMEOUT = float(os.getenv("TRANSCRIBE_TIMEOUT", "60"))
+# 佇列已滿、模型還不能用 → 503；逾時 → 504（呼叫端可重試）；其他轉錄失敗 → 500
+TRANSCRIBE_ERROR_STATUS = {QUEUE_FULL: 503, MODEL_UNAVAILABLE: 503, TIMEOUT: 504}
+
+@app.route('/api/speech-recognition/transcribe', methods=['POST'])
+def api_transcribe():
+    """
+    輸入: multipart/form-data  audio=<音檔>
+        或 本體為 WAV / 16kHz 單聲道 int16 PCM（Content-Type: audio/wav 或 application/octet-stream）
+        或 JSON { "path": "App/server/uploads/ 內已存好的音檔" }（server.js 上傳後轉送）
+    回傳: JSON { "success": true, "text": "繁體文字", "signLanguage": "字典轉換的手語語序",
+                 "timing": { "queue_ms": 排隊時間, "compute_ms": 轉錄時間 } }
+    """
+    data = request.get_json(silent=True) or {}
+    audio = request.files.get('audio')
+    if audio is not None:
+        content = audio.read()
+        if content[:4] == b'RIFF':
+            # WAV 直接在記憶體內解碼，不寫暫存檔
+            result = get_transcription_service().transcribe(content, timeout=TRANSCRIBE_TIMEOUT)
+        else:
+            # webm 等其他格式仍需 whisper 透過 ffmpeg 解碼檔案
+            suffix = os.path.splitext(secure_filename(audio.filename or ''))[1] or '.webm'
+            with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as f:
+                f.write(content)
+            try:
+                result = get_transcription_service().transcribe(f.name, timeout=TRANSCRIBE_TIMEOUT)
+            finally:
+                os.remove(f.name)
+    elif request.mimetype in ('audio/wav', 'audio/x-wav', 'application/octet-stream'):
+        # 請求本體就是 WAV 或 16kHz 單聲道 int16 PCM
+        result = get_transcription_service().transcribe(request.get_data(), timeout=TRANSCRIBE_TIMEOUT)
+    elif data.get('path'):
+        path = os.path.realpath(data['path'])
+        if os.path.commonpath([path, os.path.realpath(SPEECH_UPLOAD_DIR)]) != os.path.realpath(SPEECH_UPLOAD_DIR):
+            return jsonify({"success": False, "error": "只接受 uploads 目錄內的檔案"}), 400
+        if not os.path.exists(path):
+            return jsonify({"success": False, "error": "音頻檔案不存在"}), 404
+        result = get_transcription_service().transcribe(path, timeout=TRANSCRIBE_TIMEOUT)
+    else:
+        return jsonify({"success": False, "error": "未提供音頻檔案"}), 400
+    if result.get('success'):
+        return jsonify(result), 200
+    return jsonify(result), TRANSCRIBE_ERROR_STATUS.get(result.get('code'), 500)
+
+@app.route('/api/speech-recognition/stats', methods=['GET'])
+def api_transcribe_stats():
+    # 模型載入時間、佇列長度、排隊與轉錄時間的 p50/p99
+    return jsonify(get_transcription_service().stats())
+
+
+# === 前端 MediaPipe 關節點上傳（二進位格式見 landmark_wire.py）===
+@app.route('/api/sign-language-recognition/frame', methods=['POST', 'DELETE'])
+def ingest_landmark_frames():
+    """
+    輸入: application/octet-stream，一批 frame 的關節點
+          session 由 header X-Session-Id 或 ?session= 指定
+    回傳: JSON { "success": true, "session": ..., "frames": N,
+                 "words": [這批新增的句子...], "sentence": "目前句子" }
+    DELETE: 清除該 session 的辨識狀態
+    """
+    session_id = request.headers.get('X-Session-Id') or request.args.get('session') or 'default'
+
+    if request.method == 'DELETE':
+        recognition_sessions.reset(session_id)
+        return jsonify({"success": True, "session": session_id})
+
+    if request.content_length is not None and request.content_length > max_payload_bytes():
+        return jsonify({"success": False, "message": f"payload larger than {max_payload_bytes()} bytes"}), 413
+    try:
+        lh_xyz, rh_xyz, arm_xyz = decode_frames(request.get_data(cache=False))
+    except WireFormatError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+
+    result = recognition_sessions.process(session_id, lh_xyz, rh_xyz, arm_xyz)
+    if result is None:
+        return jsonify({"success": False, "message": "model unavailable"}), 503
+    return jsonify({"success": True, "session": session_id, "frames": len(lh_xyz), **result})
+
+
+@app.route('/api/sign-language-recognition/stats', methods=['GET'])
+def recognition_stats():
+    # session 數、micro-batch 佇列深度 / batch 大小分布、推論後端延遲
+    return jsonify(recognition_sessions.stats())
+
+
+@app.route('/api/translate/batch', methods=['POST'])
+def api_translate_batch():
+    """
+    輸入: JSON { "direction": "natural_to_sign" | "sign_to_natural", "texts": ["句子", ...] }
+    回傳: JSON { "success": true, "results": [{ "input": "句子", "output": "翻譯" 或 null }, ...] }
+    整批查詢一次 encode，LLM 請求同時最多 LLM_MAX_CONCURRENCY 個；失敗的句子 output 為 null。
+    翻譯在這個請求內同步完成，所以單次最多 BATCH_MAX_TEXTS 句（預設 32），避免長時間佔住 worker thread；
+    整份劇本請改用 python batch_translate.py（可中斷續跑）。
+    """
+    data = request.get_json(silent=True) or {}
+    direction = data.get('direction')
+    texts = data.get('texts')
+    if not isinstance(texts, list) or not all(isinstance(t, str) for t in texts):
+        return jsonify({"success": False, "message": "texts must be a list of strings"}), 400
+    texts = [t.strip() for t in texts]
+    if direction not in DIRECTIONS or not texts or not all(texts):
+        return jsonify({"success": False, "message": "direction and non-empty texts are required"}), 400
+    if len(texts) > BATCH_MAX_TEXTS:
+        return jsonify({"success": False, "message": f"at most {BATCH_MAX_TEXTS} texts per request; use batch_translate.py for larger jobs"}), 413
+    outputs = translate_many(texts, direction, workers=get_llm_client().max_concurrency)
+    return jsonify({"success": True,
+                    "results": [{"input": t, "output": o} for t, o in zip(texts, outputs)]})
+
+
+@app.route('/api/translate/stats', methods=['GET'])
+def translate_stats():
+    # 翻譯結果快取與查詢向量快取的命中率、embedding micro-batch 統計
+    return jsonify({'translations': get_translation_cache().stats(),
+                    'semantic': get_semantic_cache().stats(),
+                    'llm': get_llm_client().stats(),
+                    'speculative': speculator.stats(),
+                    'embedder': get_embedding_service().stats()})
 
 
 @app.route('/process_pdf', methods=['POST'])
@@ -212,8 +467,15 @@ from flask import make_response
 @app.route('/video_feed')
 def video_feed():
     try:
-        # 直接將 start() 作為 Response 的資料來源
-        response = Response(start(), mimetype='multipart/x-mixed-replace; boundary=frame')
+        # 預設所有連線共用同一組攝影機與辨識 pipeline；?shared=0 時改為每個連線各跑一次 start()
+        if request.args.get('shared') == '0':
+            # ?pipeline=1 / 0 可覆寫 SIGN_PIPELINE
+            pipeline = request.args.get('pipeline')
+            pipelined = None if pipeline is None else pipeline == '1'
+            frames = start(pipelined=pipelined)
+        else:
+            frames = get_broadcaster().subscribe()
+        response = Response(frames, mimetype='multipart/x-mixed-replace; boundary=frame')
         response.headers.add('Access-Control-Allow-Credentials', 'true')
         return response
     except Exception as e:
@@ -222,6 +484,21 @@ def video_feed():
         error_response.headers.add('Access-Control-Allow-Credentials', 'true')
         return error_response
 
+def warm_up():
+    # 背景先載入並預熱手語模型，第一個 /video_feed 連線不用等
+    threading.Thread(target=get_sign_model, daemon=True).start()
+    # 兩個翻譯方向共用的 embedding 模型與語料索引也先載入
+    threading.Thread(target=get_corpus_registry().warm_up, daemon=True).start()
+    # Whisper 模型在轉錄服務的背景 thread 載入，之後常駐
+    get_transcription_service()
+
+
+def warmed_app():
+    """gunicorn 用：gunicorn -w 1 -k gthread --threads 16 'app:warmed_app()'（不會執行下面的 __main__）"""
+    warm_up()
+    return app
+
+
 if __name__ == '__main__':
-    app.config['UPLOAD_FOLDER'] = 'uploads'
+    warm_up()
     app.run(host='0.0.0.0', port=5050)
@@ -0,0 +1,119 @@
+"""
+跨 session 的 micro-batch 排程器
+多個 session 各自送出 batch=1 的請求時，在 max_wait_ms 內（或湊滿 max_batch 筆）
+合併成一次 forward pass，再把結果分回各自的呼叫端。CPU 上的 GRU / matmul
+一次算多筆幾乎不增加時間，可大幅提高總吞吐量。
+
+MicroBatchScheduler 本身與模型無關：batch_fn 接收 item 的 list、回傳同長度的結果 list。
+"""
+import queue
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future
+
+import numpy as np
+
+
+class MicroBatchScheduler:
+    def __init__(self, batch_fn, max_batch=16, max_wait_ms=2.0, name="batch"):
+        self.batch_fn = batch_fn
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self.name = name
+
+        self._queue = queue.Queue()
+        self._batch_sizes = Counter()
+        self._queue_depths = Counter()
+        self._batches = 0
+        self._items = 0
+        self._wait_total = 0.0
+        self._closed = False
+        self._worker = threading.Thread(target=self._loop, name=f"{name}-scheduler", daemon=True)
+        self._worker.start()
+
+    def submit(self, item):
+        """送出一筆，回傳 Future。"""
+        if self._closed:
+            raise RuntimeError(f"{self.name} scheduler 已關閉")
+        future = Future()
+        self._queue.put((item, future, time.perf_counter()))
+        return future
+
+    def run(self, item, timeout=None):
+        """送出一筆並等待結果。"""
+        return self.submit(item).result(timeout)
+
+    def close(self):
+        self._closed = True
+        self._queue.put(None)
+        self._worker.join(timeout=2.0)
+
+    def _collect(self):
+        first = self._queue.get()
+        if first is None:
+            return None
+        # 取到第一筆時佇列裡還有幾筆（含這筆）
+        self._queue_depths[self._queue.qsize() + 1] += 1
+        batch = [first]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            try:
+                entry = self._queue.get(timeout=max(remaining, 0)) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if entry is None:
+                self._queue.put(None)  # 讓外層迴圈結束
+                break
+            batch.append(entry)
+        return batch
+
+    def _loop(self):
+        while True:
+            batch = self._collect()
+            if batch is None:
+                break
+            items = [item for item, _, _ in batch]
+            futures = [future for _, future, _ in batch]
+            start = time.perf_counter()
+            for _, _, submitted in batch:
+                self._wait_total += start - submitted
+            try:
+                results = self.batch_fn(items)
+            except Exception as e:
+                for future in futures:
+                    future.set_exception(e)
+                continue
+            finally:
+                self._batches += 1
+                self._items += len(batch)
+                self._batch_sizes[len(batch)] += 1
+            for future, result in zip(futures, results):
+                future.set_result(result)
+
+    def stats(self):
+        return {
+            'name': self.name,
+            'max_batch': self.max_batch,
+            'max_wait_ms': self.max_wait * 1000.0,
+            'pending': self._queue.qsize(),
+            'batches': self._batches,
+            'items': self._items,
+            'mean_batch_size': self._items / self._batches if self._batches else 0.0,
+            'mean_queue_wait_ms': self._wait_total / self._items * 1000.0 if self._items else 0.0,
+            'batch_size_histogram': dict(sorted(self._batch_sizes.items())),
+            'queue_depth_histogram': dict(sorted(self._queue_depths.items())),
+        }
+
+
+def model_batcher(sign_model, max_batch=16, max_wait_ms=2.0):
+    """
+    包在 sign_model.predict 前面的 scheduler。
+    scheduler.run(x) 與 sign_model.predict 介面相同：(1, seq_len, feat_dim) -> (1, num_classes)。
+    """
+    def batch_fn(windows):
+        out = sign_model.predict(np.concatenate(windows, axis=0))
+        return [out[i:i + 1] for i in range(len(windows))]
+
+    return MicroBatchScheduler(batch_fn, max_batch=max_batch, max_wait_ms=max_wait_ms, name="sign_model")
@@ -0,0 +1,198 @@
+"""
+批次翻譯：一次預先翻譯整份劇本（docx、txt 或 sign_language_dic.txt 格式）
+translate_sentence / translate_to_natural 一次只翻一句，translate_to_sign.py 的 CLI 每句都要重新啟動、
+重新載入 embedding 模型與索引，導入一份新劇本要好幾個小時。
+
+現在：
+    - 每 BATCH_WINDOW 句的檢索查詢一次 encode（之後每句的 RAG 檢索與語意快取查詢都命中查詢快取）
+    - 同時最多 --workers 個翻譯在進行（實際 LLM 請求數另受 LLM_MAX_CONCURRENCY 限制）
+    - 每翻完一句就 append 一行 JSON 到 --out，中斷後以相同指令重跑會略過已完成的句子
+    - 翻譯結果同樣寫入翻譯快取，之後執行期遇到相同句子直接命中
+LLM 失敗的句子不寫入（不使用字典降級結果），重跑時再試。
+
+輸入格式：
+    .docx / .txt 含「自然中文：… 手語語序：…」或「手語：… 轉譯：…」劇本格式時取出對應方向的輸入句，
+    否則每個段落（每行）一句；「自然中文 -> 手語語序」格式的行依方向取左邊或右邊。
+
+用法：
+    python batch_translate.py 新劇本.docx --direction natural_to_sign --out .rag_cache/batch/新劇本.jsonl
+    python batch_translate.py sign_language_dic.txt --direction sign_to_natural --out out.jsonl --workers 8 --dic out.txt
+"""
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from embedding_service import normalize_text
+from semantic_cache import NL_SCRIPT_RE, SIGN_SCRIPT_RE, SPEECH_DIR, docx_text
+from translation_cache import NATURAL_TO_SIGN, SIGN_TO_NATURAL
+
+DIRECTIONS = (SIGN_TO_NATURAL, NATURAL_TO_SIGN)
+# 一次 encode 的查詢數；需小於 RAG_QUERY_CACHE_SIZE，否則翻到後面時前面的向量已被淘汰
+BATCH_WINDOW = 256
+
+
+# ==================== 輸入 ====================
+def load_sentences(path, direction):
+    """回傳要翻譯的輸入句（保持原順序，以正規化後的文字去重）。"""
+    if path.lower().endswith('.docx'):
+        text = docx_text(path)
+    else:
+        with open(path, encoding='utf-8') as f:
+            text = f.read()
+
+    # 兩種劇本格式都能用：「自然中文：A 手語語序：B」與「手語：B 轉譯：A」，依方向取 A 或 B
+    natural_first = NL_SCRIPT_RE.findall(text)
+    sign_first = SIGN_SCRIPT_RE.findall(text)
+    if direction == NATURAL_TO_SIGN:
+        sentences = [natural for natural, _ in natural_first] + [natural for _, natural in sign_first]
+    else:
+        sentences = [sign for sign, _ in sign_first] + [sign for _, sign in natural_first]
+    if not sentences:
+        for line in text.splitlines():
+            if '->' in line:
+                natural, sign = line.split('->', 1)
+                line = natural if direction == NATURAL_TO_SIGN else sign
+            sentences.append(line)
+
+    seen = set()
+    unique = []
+    for sentence in sentences:
+        sentence = ' '.join(sentence.split())
+        key = normalize_text(sentence)
+        if key and key not in seen:
+            seen.add(key)
+            unique.append(sentence)
+    return unique
+
+
+def load_progress(out_path):
+    """讀取先前的輸出，回傳 {正規化後的輸入: 翻譯}。"""
+    done = {}
+    if not os.path.exists(out_path):
+        return done
+    with open(out_path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                row = json.loads(line)
+            except ValueError:
+                continue  # 中斷時寫到一半的最後一行
+            if row.get('output'):
+                done[normalize_text(row['input'])] = row['output']
+    return done
+
+
+# ==================== 翻譯 ====================
+def _translators():
+    """回傳 {方向: (翻譯函式, 批次檢索函式)}。"""
+    if SPEECH_DIR not in sys.path:
+        sys.path.append(SPEECH_DIR)
+    import llm_translate_to_natural
+    import translate_to_sign
+
+    return {
+        SIGN_TO_NATURAL: (llm_translate_to_natural.translate_to_natural, llm_translate_to_natural.retrieve_many),
+        NATURAL_TO_SIGN: (translate_to_sign.translate_sentence, translate_to_sign.retrieve_many),
+    }
+
+
+def translate_many(texts, direction, workers=4, on_result=None):
+    """
+    翻譯多句，回傳與 texts 等長的結果（失敗為 None）。
+    on_result(index, text, output) 在每句完成時呼叫（完成順序，不一定是輸入順序）。
+    """
+    translate, retrieve_many = _translators()[direction]
+    results = [None] * len(texts)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for start in range(0, len(texts), BATCH_WINDOW):
+            window = texts[start:start + BATCH_WINDOW]
+            retrieve_many(window)  # 整批查詢一次 encode 並放進查詢快取
+            futures = {pool.submit(translate, text, False): i for i, text in enumerate(window, start)}
+            for future in as_completed(futures):
+                i = futures[future]
+                try:
+                    results[i] = future.result() or None
+                except Exception as e:  # LLMUnavailable 或其他錯誤：這句記為失敗，其餘照常
+                    print(f"⚠️ 翻譯失敗（{texts[i]}）：{e}")
+                if on_result is not None:
+                    on_result(i, texts[i], results[i])
+    return results
+
+
+def run(path, direction, out_path, workers=4, dic_path=None):
+    sentences = load_sentences(path, direction)
+    done = load_progress(out_path)
+    todo = [s for s in sentences if normalize_text(s) not in done]
+    print(f"ℹ️ {path}：共 {len(sentences)} 句，已完成 {len(sentences) - len(todo)} 句，待翻譯 {len(todo)} 句")
+
+    os.makedirs(os.path.dirname(os.path.abspath(out_path)), exist_ok=True)
+    lock = threading.Lock()
+    counts = {'ok': 0, 'failed': 0}
+    t0 = time.perf_counter()
+
+    with open(out_path, 'a+', encoding='utf-8') as out:
+        if out.tell() > 0:
+            out.seek(out.tell() - 1)
+            if out.read(1) != '\n':
+                out.write('\n')  # 上次中斷時最後一行沒寫完
+
+        def on_result(_, text, output):
+            with lock:
+                if output is None:
+                    counts['failed'] += 1
+                else:
+                    counts['ok'] += 1
+                    done[normalize_text(text)] = output
+                    out.write(json.dumps({'input': text, 'output': output, 'direction': direction},
+                                         ensure_ascii=False) + '\n')
+                    out.flush()
+                finished = counts['ok'] + counts['failed']
+                if finished % 20 == 0 or finished == len(todo):
+                    rate = finished / max(time.perf_counter() - t0, 1e-9)
+                    print(f"  {finished}/{len(todo)}（{rate:.1f} 句/秒，失敗 {counts['failed']}）")
+
+        if todo:
+            translate_many(todo, direction, workers, on_result)
+
+    print(f"✅ 完成 {counts['ok']} 句，失敗 {counts['failed']} 句（重跑相同指令會重試失敗的句子）")
+    if dic_path:
+        export_dictionary(sentences, done, direction, dic_path)
+    return counts
+
+
+def export_dictionary(sentences, done, direction, dic_path):
+    """輸出成 sign_language_dic.txt 格式（自然中文 -> 手語語序），依輸入順序。"""
+    lines = []
+    for sentence in sentences:
+        output = done.get(normalize_text(sentence))
+        if not output:
+            continue
+        output = output.split('\n')[0].strip()  # 去掉「註：已轉為繁體」等附註
+        natural, sign = (sentence, output) if direction == NATURAL_TO_SIGN else (output, sentence)
+        lines.append(f"{natural} -> {sign}\n")
+    tmp = dic_path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        f.writelines(lines)
+    os.replace(tmp, dic_path)
+    print(f"✅ 已輸出 {len(lines)} 行對照字典：{dic_path}")
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="批次翻譯劇本句子")
+    parser.add_argument('input', help='.docx、.txt 或 sign_language_dic.txt 格式的檔案')
+    parser.add_argument('--direction', choices=DIRECTIONS, required=True)
+    parser.add_argument('--out', required=True, help='逐句寫入的 JSON lines 檔（同時是續跑的進度）')
+    parser.add_argument('--workers', type=int, default=4, help='同時進行的翻譯數')
+    parser.add_argument('--dic', help='完成後另外輸出成 sign_language_dic.txt 格式')
+
+    args = parser.parse_args(argv)
+    counts = run(args.input, args.direction, args.out, args.workers, args.dic)
+    return 1 if counts['failed'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,96 @@
+"""
+單一攝影機、多個訂閱者
+整個 process 只有一組 RecognitionPipeline 開著 VideoCapture(0) 並跑 Holistic + 模型；
+每個 /video_feed 連線只是讀取最新編碼好的畫面，不會重跑偵測。
+辨識結果（新詞）透過 listener 通知；最後一個訂閱者離開時停止 pipeline、釋放攝影機。
+"""
+import threading
+
+from recognition_pipeline import RecognitionPipeline, publish_result
+
+
+class CameraBroadcaster:
+    def __init__(self, sign_model_loader, camera_index=0):
+        self._load_model = sign_model_loader
+        self.camera_index = camera_index
+        self._pipeline = None
+        self._subscribers = 0
+        self._listeners = [publish_result]
+        self._lock = threading.Lock()
+
+    # ==================== 辨識事件 ====================
+    def add_listener(self, callback):
+        with self._lock:
+            self._listeners.append(callback)
+
+    def remove_listener(self, callback):
+        with self._lock:
+            if callback in self._listeners:
+                self._listeners.remove(callback)
+
+    def _publish(self, trans_result):
+        for callback in list(self._listeners):
+            try:
+                callback(trans_result)
+            except Exception as e:
+                print(f"❌ 通知辨識結果失敗: {e}")
+
+    @property
+    def subscriber_count(self):
+        return self._subscribers
+
+    @property
+    def latest_sentence(self):
+        pipeline = self._pipeline
+        return pipeline.recognizer.trans_result if pipeline is not None else ""
+
+    # ==================== 訂閱 ====================
+    def _acquire(self):
+        with self._lock:
+            if self._pipeline is None or not self._pipeline.running:
+                if self._pipeline is not None:
+                    self._pipeline.stop()
+                    self._pipeline = None
+                sign_model = self._load_model()
+                if sign_model is None:
+                    return None
+                pipeline = RecognitionPipeline(sign_model, on_update=self._publish,
+                                               camera_index=self.camera_index)
+                if not pipeline.start():
+                    return None
+                self._pipeline = pipeline
+            self._subscribers += 1
+            return self._pipeline
+
+    def _release(self, pipeline):
+        with self._lock:
+            self._subscribers -= 1
+            if self._subscribers == 0 and self._pipeline is pipeline:
+                print("👋 最後一個訂閱者離開，停止攝影機")
+                pipeline.stop()
+                self._pipeline = None
+
+    def subscribe(self):
+        """MJPEG generator；每個 HTTP 連線各自呼叫一次。"""
+        pipeline = self._acquire()
+        if pipeline is None:
+            return
+        print(f"📺 新訂閱者加入（目前 {self._subscribers} 個）")
+        try:
+            yield from pipeline.mjpeg()
+        finally:
+            self._release(pipeline)
+
+
+_broadcaster = None
+_broadcaster_lock = threading.Lock()
+
+
+def get_broadcaster():
+    """process 內共用的 broadcaster。"""
+    global _broadcaster
+    with _broadcaster_lock:
+        if _broadcaster is None:
+            from model_registry import get_sign_model
+            _broadcaster = CameraBroadcaster(get_sign_model)
+        return _broadcaster
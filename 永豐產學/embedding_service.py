@@ -0,0 +1,220 @@
+"""
+共用的 embedding 服務與語料註冊表
+以前 llm_translate_to_natural.py 與 translate_to_sign.py 各自載入一份
+SentenceTransformer("shibing624/text2vec-base-chinese")，app.py 兩個都 import，
+同一個 process 就有兩份 BERT 大小的模型。
+
+現在：
+    get_embedding_service()  每個 process 一份，第一次需要 encode 時才載入模型；
+                             兩個翻譯方向的查詢都經由同一個 MicroBatchScheduler 合併成一次 encode
+    get_corpus_registry()    依名稱管理多份語料索引（rag_sentence、rag_nlToSign），第一次使用時才載入
+
+櫃台常重複出現相同的短句（例如「我 申請 存摺」），查詢向量以正規化後的文字為 key
+存在有上限的 LRU 快取（RAG_QUERY_CACHE_SIZE，預設 1024 筆），命中時完全不跑 transformer。
+"""
+import os
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+
+import numpy as np
+
+from batch_scheduler import MicroBatchScheduler
+from rag_index import load_rag_index
+from retrieval import DEFAULT_INDEX_TYPE, DEFAULT_MIN_SIMILARITY
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+EMBED_MODEL_NAME = os.getenv("RAG_EMBED_MODEL", "shibing624/text2vec-base-chinese")
+
+# 內建語料：名稱 → (docx 路徑, 切塊長度)
+DEFAULT_CORPORA = {
+    'rag_sentence': (os.path.join(BASE_DIR, 'rag_sentence.docx'), 80),    # 手語語序 → 自然中文
+    'rag_nlToSign': (os.path.join(BASE_DIR, 'App', 'server', 'rag_nlToSign.docx'), 80),  # 自然中文 → 手語語序
+}
+
+
+QUERY_CACHE_SIZE = int(os.getenv("RAG_QUERY_CACHE_SIZE", "1024"))
+
+_WHITESPACE_RE = re.compile(r'\s+')
+
+
+def normalize_text(text):
+    """快取 key：全形半形統一（NFKC）、去頭尾空白、連續空白合併成一個。"""
+    return _WHITESPACE_RE.sub(' ', unicodedata.normalize('NFKC', text)).strip()
+
+
+class EmbeddingCache:
+    """有上限的查詢向量 LRU 快取，附命中 / 未命中計數。"""
+
+    def __init__(self, max_size=QUERY_CACHE_SIZE):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            vector = self._items.get(key)
+            if vector is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return vector
+
+    def put(self, key, vector):
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._items[key] = vector
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'size': len(self._items),
+            'max_size': self.max_size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+        }
+
+
+class EmbeddingService:
+    def __init__(self, model_name=EMBED_MODEL_NAME, max_batch=32, max_wait_ms=5.0,
+                 cache_size=QUERY_CACHE_SIZE):
+        self.model_name = model_name
+        self.cache = EmbeddingCache(cache_size)
+        self._model = None
+        self._lock = threading.Lock()
+        self.scheduler = MicroBatchScheduler(
+            lambda texts: list(self.encode_batch(texts)),
+            max_batch=max_batch, max_wait_ms=max_wait_ms, name="embedder")
+
+    @property
+    def model(self):
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    from sentence_transformers import SentenceTransformer
+                    print(f"ℹ️ 載入 embedding 模型：{self.model_name}")
+                    self._model = SentenceTransformer(self.model_name)
+        return self._model
+
+    def encode_batch(self, texts):
+        """直接 encode 一整批文字（建立語料索引用），回傳 (n, dim) float32。"""
+        return np.asarray(self.model.encode(list(texts), convert_to_numpy=True), dtype='float32')
+
+    def encode(self, text):
+        """
+        單筆查詢，回傳 (dim,)。先查 LRU 快取；
+        未命中時與其他 thread 同時送來的查詢合併成一次 encode。
+        """
+        key = normalize_text(text)
+        vector = self.cache.get(key)
+        if vector is None:
+            vector = self.scheduler.run(key)
+            self.cache.put(key, vector)
+        return vector
+
+    def encode_many(self, texts):
+        """多筆查詢，回傳 (n, dim)：命中快取的直接取用，其餘（去重後）一次 forward pass。"""
+        keys = [normalize_text(t) for t in texts]
+        found = {}
+        for key in keys:
+            if key not in found:
+                found[key] = self.cache.get(key)
+        missing = [key for key, vector in found.items() if vector is None]
+        if missing:
+            for key, vector in zip(missing, self.encode_batch(missing)):
+                found[key] = vector
+                self.cache.put(key, vector)
+        return np.stack([found[key] for key in keys])
+
+    def stats(self):
+        return {'model': self.model_name, 'loaded': self._model is not None,
+                'query_cache': self.cache.stats(), **self.scheduler.stats()}
+
+
+class CorpusRegistry:
+    def __init__(self, embedding_service, index_type=DEFAULT_INDEX_TYPE):
+        self.embeddings = embedding_service
+        self.index_type = index_type
+        self._specs = {}
+        self._indexes = {}
+        self._lock = threading.Lock()
+
+    def register(self, name, docx_path, max_len=80):
+        with self._lock:
+            self._specs[name] = (docx_path, max_len)
+            self._indexes.pop(name, None)
+
+    def names(self):
+        return list(self._specs)
+
+    def get(self, name):
+        """取得已載入的語料索引（RagIndex），第一次使用時才從快取載入或建立。"""
+        rag = self._indexes.get(name)
+        if rag is not None:
+            return rag
+        with self._lock:
+            rag = self._indexes.get(name)
+            if rag is None:
+                if name not in self._specs:
+                    raise KeyError(f"未註冊的語料：{name}")
+                docx_path, max_len = self._specs[name]
+                rag = load_rag_index(docx_path, self.embeddings.encode_batch,
+                                     self.embeddings.model_name, max_len=max_len,
+                                     index_type=self.index_type)
+                self._indexes[name] = rag
+            return rag
+
+    def version(self, name):
+        """語料版本（docx 內容、切塊參數與 embedding 模型的雜湊），用於翻譯結果快取的 key。"""
+        return self.get(name).key[:16]
+
+    def warm_up(self):
+        """載入所有已註冊的語料與 embedding 模型（背景預熱用）。"""
+        for name in self.names():
+            self.get(name)
+        self.embeddings.encode("")
+
+    def search(self, name, query, k=5, min_similarity=DEFAULT_MIN_SIMILARITY):
+        """單筆查詢，回傳 [(chunk, cosine similarity), ...]（由高到低，已套用相似度門檻）。"""
+        rag = self.get(name)
+        return rag.search(self.embeddings.encode(query), k, min_similarity)[0]
+
+    def retrieve_many(self, name, queries, k=5, min_similarity=DEFAULT_MIN_SIMILARITY):
+        """多筆查詢：未命中快取的查詢一次 encode、整批一次 FAISS 搜尋；回傳每筆的 search 結果。"""
+        if not queries:
+            return []
+        rag = self.get(name)
+        return rag.search(self.embeddings.encode_many(queries), k, min_similarity)
+
+
+_service = None
+_registry = None
+_singleton_lock = threading.Lock()
+
+
+def get_embedding_service():
+    global _service
+    with _singleton_lock:
+        if _service is None:
+            _service = EmbeddingService()
+        return _service
+
+
+def get_corpus_registry():
+    global _registry
+    service = get_embedding_service()
+    with _singleton_lock:
+        if _registry is None:
+            _registry = CorpusRegistry(service)
+            for name, (docx_path, max_len) in DEFAULT_CORPORA.items():
+                _registry.register(name, docx_path, max_len)
+        return _registry
@@ -0,0 +1,38 @@
+"""
+process 內的事件匯流排
+辨識器直接 publish，不再對自己的 /handlanRes 發 HTTP loopback。
+
+bus.add_handler(topic, fn) 註冊同步 callback（例如把結果寫進 state_store）；
+前端的 Server-Sent Events 由 state_store.sse_stream 從訊息紀錄推送，可用 Last-Event-ID 續傳。
+"""
+import threading
+
+# 主題名稱
+SIGN_RESULT = 'handlanRes'    # 客戶手語辨識出的手語語序
+STAFF_SIGN_SEQ = 'staff'      # 行員語音 → 手語語序
+
+
+class EventBus:
+    def __init__(self):
+        self._handlers = {}
+        self._lock = threading.Lock()
+
+    def add_handler(self, topic, handler):
+        with self._lock:
+            self._handlers.setdefault(topic, []).append(handler)
+
+    def publish(self, topic, data):
+        with self._lock:
+            handlers = list(self._handlers.get(topic, []))
+        for handler in handlers:
+            try:
+                handler(data)
+            except Exception as e:
+                print(f"❌ 事件處理失敗（{topic}）: {e}")
+
+
+_bus = EventBus()
+
+
+def get_event_bus():
+    return _bus
@@ -0,0 +1,229 @@
+"""
+手語分類模型的推論後端
+    predict ：Keras model.predict（舊做法，每次都會建立 data adapter 與 callbacks，僅供比較）
+    direct  ：直接呼叫 model(x, training=False)
+    function：固定 input signature 的 tf.function（預設）
+    tflite  ：TFLite Interpreter，需先用 export 指令轉出 .tflite
+
+每個後端都會記錄每次呼叫的延遲，可用 stats() 或 bench 指令比較。
+
+用法：
+    python inference_backend.py export App/Model/model_1126_3GRU.keras
+    python inference_backend.py bench  App/Model/model_1126_3GRU.keras --runs 200
+"""
+import abc
+import os
+import sys
+import time
+import threading
+from collections import deque
+import numpy as np
+
+BACKENDS = ('predict', 'direct', 'function', 'tflite')
+DEFAULT_BACKEND = 'function'
+
+
+class InferenceBackend(abc.ABC):
+    name = None
+
+    def __init__(self, sequence_length, feat_dim, history=1000):
+        self.sequence_length = sequence_length
+        self.feat_dim = feat_dim
+        self._latencies = deque(maxlen=history)  # 毫秒
+        self._calls = 0
+
+    @abc.abstractmethod
+    def _run(self, x):
+        """子類別實作：x 已是 float32 連續陣列，回傳 (batch, num_classes)。"""
+
+    def predict(self, x):
+        """x: (batch, seq_len, feat_dim) -> (batch, num_classes) 的 numpy 陣列"""
+        x = np.ascontiguousarray(x, dtype=np.float32)
+        t0 = time.perf_counter()
+        out = self._run(x)
+        self._latencies.append((time.perf_counter() - t0) * 1000.0)
+        self._calls += 1
+        return out
+
+    def reset_stats(self):
+        """清除延遲紀錄與呼叫次數（例如 benchmark 預熱之後）。"""
+        self._latencies.clear()
+        self._calls = 0
+
+    def stats(self):
+        lat = np.array(self._latencies, dtype=np.float64)
+        if lat.size == 0:
+            return {'backend': self.name, 'calls': self._calls}
+        return {
+            'backend': self.name,
+            'calls': self._calls,
+            'mean_ms': float(lat.mean()),
+            'p50_ms': float(np.percentile(lat, 50)),
+            'p99_ms': float(np.percentile(lat, 99)),
+        }
+
+
+class KerasPredictBackend(InferenceBackend):
+    name = 'predict'
+
+    def __init__(self, model, sequence_length, feat_dim):
+        super().__init__(sequence_length, feat_dim)
+        self.model = model
+
+    def _run(self, x):
+        return self.model.predict(x, verbose=0)
+
+
+class DirectBackend(InferenceBackend):
+    name = 'direct'
+
+    def __init__(self, model, sequence_length, feat_dim):
+        super().__init__(sequence_length, feat_dim)
+        self.model = model
+
+    def _run(self, x):
+        return np.asarray(self.model(x, training=False))
+
+
+class TFFunctionBackend(InferenceBackend):
+    name = 'function'
+
+    def __init__(self, model, sequence_length, feat_dim):
+        import tensorflow as tf
+        super().__init__(sequence_length, feat_dim)
+        self.model = model
+        # batch 維度保留 None，micro-batch 時不會重新 trace
+        spec = tf.TensorSpec([None, sequence_length, feat_dim], tf.float32)
+        self._fn = tf.function(lambda x: model(x, training=False), input_signature=[spec])
+
+    def _run(self, x):
+        return self._fn(x).numpy()
+
+
+class TFLiteBackend(InferenceBackend):
+    name = 'tflite'
+
+    def __init__(self, tflite_path, sequence_length, feat_dim, num_threads=None):
+        import tensorflow as tf
+        super().__init__(sequence_length, feat_dim)
+        self.path = tflite_path
+        self._interpreter = tf.lite.Interpreter(model_path=tflite_path, num_threads=num_threads)
+        self._input = self._interpreter.get_input_details()[0]['index']
+        self._output = self._interpreter.get_output_details()[0]['index']
+        self._batch = None
+        # Interpreter 不是 thread-safe
+        self._lock = threading.Lock()
+
+    def _run(self, x):
+        with self._lock:
+            if x.shape[0] != self._batch:
+                self._interpreter.resize_tensor_input(self._input, list(x.shape))
+                self._interpreter.allocate_tensors()
+                self._batch = x.shape[0]
+            self._interpreter.set_tensor(self._input, x)
+            self._interpreter.invoke()
+            return self._interpreter.get_tensor(self._output).copy()
+
+
+def tflite_path_for(model_path):
+    return os.path.splitext(model_path)[0] + '.tflite'
+
+
+def make_backend(name, model, sequence_length, feat_dim, model_path=None):
+    if name == 'predict':
+        return KerasPredictBackend(model, sequence_length, feat_dim)
+    if name == 'direct':
+        return DirectBackend(model, sequence_length, feat_dim)
+    if name == 'function':
+        return TFFunctionBackend(model, sequence_length, feat_dim)
+    if name == 'tflite':
+        path = tflite_path_for(model_path)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"找不到 {path}，請先執行 python inference_backend.py export {model_path}")
+        return TFLiteBackend(path, sequence_length, feat_dim)
+    raise ValueError(f"不支援的推論後端：{name}")
+
+
+def export_tflite(model_path, out_path=None):
+    """
+    .keras -> .tflite。GRU/LSTM 與 SelfAttention/TransformerEncoderBlock 等自訂層
+    需要 SELECT_TF_OPS 並關閉 tensor list lowering（同 notebook 內的轉換設定）。
+    """
+    import tensorflow as tf
+    from model_registry import load_keras_model, read_manifest
+
+    model = load_keras_model(model_path)
+    manifest = read_manifest(model_path) or {}
+    seq_len = manifest.get('sequence_length', model.input.shape[1])
+    feat_dim = manifest.get('feat_dim', model.input.shape[2])
+
+    # 固定序列長度與特徵維度再轉換，只保留 batch 維度可變（micro-batch 用）
+    spec = tf.TensorSpec([None, seq_len, feat_dim], tf.float32)
+    concrete = tf.function(lambda x: model(x, training=False)).get_concrete_function(spec)
+
+    converter = tf.lite.TFLiteConverter.from_concrete_functions([concrete], model)
+    converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS, tf.lite.OpsSet.SELECT_TF_OPS]
+    converter._experimental_lower_tensor_list_ops = False
+    tflite_model = converter.convert()
+
+    out_path = out_path or tflite_path_for(model_path)
+    with open(out_path, 'wb') as f:
+        f.write(tflite_model)
+    print(f"✅ 已輸出 {out_path}（{len(tflite_model) / 1024:.0f} KB）")
+    return out_path
+
+
+def benchmark(model_path, backends=BACKENDS, runs=100, batch=1):
+    """對同一個模型比較各後端的延遲，回傳 stats 的 list。"""
+    from model_registry import load_sign_model
+
+    sign_model = load_sign_model(model_path, warm_up=False)
+    x = np.random.rand(batch, sign_model.sequence_length, sign_model.feat_dim).astype(np.float32)
+    reference = None
+    report = []
+    for name in backends:
+        try:
+            backend = make_backend(name, sign_model.model, sign_model.sequence_length,
+                                   sign_model.feat_dim, model_path=sign_model.path)
+        except Exception as e:
+            print(f"⚠️ {name}: 無法建立（{e}）")
+            continue
+        out = backend.predict(x)  # 預熱，不列入統計
+        backend.reset_stats()
+        for _ in range(runs):
+            backend.predict(x)
+        stats = backend.stats()
+        if reference is None:
+            reference = out
+        stats['max_abs_diff'] = float(np.abs(out - reference).max())
+        report.append(stats)
+        print(f"{name:>9}: p50 {stats['p50_ms']:.2f} ms, p99 {stats['p99_ms']:.2f} ms, "
+              f"mean {stats['mean_ms']:.2f} ms, 與第一個後端最大誤差 {stats['max_abs_diff']:.2e}")
+    return report
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="手語模型推論後端工具")
+    sub = parser.add_subparsers(dest='cmd', required=True)
+
+    p_export = sub.add_parser('export', help='將 .keras 轉為 .tflite')
+    p_export.add_argument('model')
+    p_export.add_argument('out', nargs='?')
+
+    p_bench = sub.add_parser('bench', help='比較各後端延遲')
+    p_bench.add_argument('model')
+    p_bench.add_argument('--runs', type=int, default=100)
+    p_bench.add_argument('--batch', type=int, default=1)
+    p_bench.add_argument('--backends', default=','.join(BACKENDS))
+
+    args = parser.parse_args(argv)
+    if args.cmd == 'export':
+        export_tflite(args.model, args.out)
+    else:
+        benchmark(args.model, backends=args.backends.split(','), runs=args.runs, batch=args.batch)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,221 @@
+"""
+手語辨識特徵工程（向量化版本）
+訓練（notebook / 離線工具）與即時辨識（Train_Model_hands2.start）共用同一份程式碼。
+
+支援的特徵維度：
+    126：左右手原始座標 (21*3*2)
+    46 ：左右手骨架邊長度 (23*2)
+    52 ：左右手骨架邊長度 + 手臂邊長度 (23*2 + 6)
+    138：左右手骨架邊方向向量 (23*3*2)
+
+所有函式都接受單一 frame 或任意前置維度的 batch，例如：
+    hand_xyz: (21, 3) 或 (N, T, 21, 3)
+    arm_xyz : (2, 3, 3) 或 (N, T, 2, 3, 3)   # [左/右][肩/肘/腕][x/y/z]
+"""
+import os
+import numpy as np
+
+# ==================== 骨架邊定義 ====================
+HAND_EDGES = [
+    (0, 1), (1, 2), (2, 3), (3, 4),
+    (0, 5), (5, 6), (6, 7), (7, 8),
+    (0, 9), (9, 10), (10, 11), (11, 12),
+    (0, 13), (13, 14), (14, 15), (15, 16),
+    (0, 17), (17, 18), (18, 19), (19, 20),
+    (5, 9), (9, 13), (13, 17),
+]
+
+# 21/22/23 = 肩/肘/腕（沿用訓練時的編號）
+ARM_EDGES = [
+    ('left', 21, 22), ('left', 22, 23), ('left', 21, 23),
+    ('right', 21, 22), ('right', 22, 23), ('right', 21, 23),
+]
+
+# MediaPipe Pose 的手臂關節：左(肩 11, 肘 13, 腕 15)、右(肩 12, 肘 14, 腕 16)
+POSE_ARM_INDICES = np.array([[11, 13, 15], [12, 14, 16]], dtype=np.intp)
+
+SUPPORTED_FEAT_DIMS = (126, 46, 52, 138)
+
+EPS = 1e-6
+
+# 預先轉成索引陣列，計算時一次取出所有邊的端點
+_HAND_I = np.array([i for i, _ in HAND_EDGES], dtype=np.intp)
+_HAND_J = np.array([j for _, j in HAND_EDGES], dtype=np.intp)
+_HAND_SCALE_ALTS = np.array([5, 9, 13, 17], dtype=np.intp)
+
+_SIDE_INDEX = {'left': 0, 'right': 1}
+_ARM_SIDE = np.array([_SIDE_INDEX[s] for s, _, _ in ARM_EDGES], dtype=np.intp)
+_ARM_I = np.array([i - 21 for _, i, _ in ARM_EDGES], dtype=np.intp)
+_ARM_J = np.array([j - 21 for _, _, j in ARM_EDGES], dtype=np.intp)
+
+
+# ==================== MediaPipe 結果轉陣列 ====================
+def hand_xyz_from_results(hand_landmarks):
+    """MediaPipe 手部關節點 -> (21, 3)，沒偵測到時全為 0。"""
+    xyz = np.zeros((21, 3), dtype=np.float32)
+    if hand_landmarks:
+        pts = [(lm.x, lm.y, lm.z) for lm in hand_landmarks.landmark[:21]]
+        xyz[:len(pts)] = pts
+    return xyz
+
+
+def arm_xyz_from_results(pose_landmarks):
+    """MediaPipe Pose -> (2, 3, 3) 的左右手臂 肩/肘/腕 座標，沒偵測到時全為 0。"""
+    xyz = np.zeros((2, 3, 3), dtype=np.float32)
+    if pose_landmarks:
+        landmarks = pose_landmarks.landmark
+        for side in range(2):
+            for k, idx in enumerate(POSE_ARM_INDICES[side]):
+                lm = landmarks[idx]
+                xyz[side, k] = (lm.x, lm.y, lm.z)
+    return xyz
+
+
+def split_raw_keypoints(raw):
+    """notebook 的 126 維原始關節點 (..., 126) -> 左手、右手 (..., 21, 3)。"""
+    raw = np.asarray(raw, dtype=np.float32)
+    hands = raw.reshape(raw.shape[:-1] + (2, 21, 3))
+    return hands[..., 0, :, :], hands[..., 1, :, :]
+
+
+# ==================== 向量化距離 ====================
+def _safe_dist(p_i, p_j):
+    """任一端點為全 0（未偵測到）時距離為 0；支援 batch。"""
+    valid = (p_i.sum(axis=-1) != 0.0) & (p_j.sum(axis=-1) != 0.0)
+    diff = p_i - p_j
+    d = np.sqrt((diff * diff).sum(axis=-1))
+    return np.where(valid, d, 0.0).astype(np.float32)
+
+
+def _hand_scale_ref(hand_xyz):
+    """手掌尺度：優先用 手腕-中指根，否則用四個指根距離的平均，都沒有則為 1。"""
+    d = _safe_dist(hand_xyz[..., 0, :], hand_xyz[..., 9, :])
+    alts = _safe_dist(hand_xyz[..., :1, :], hand_xyz[..., _HAND_SCALE_ALTS, :])
+    pos = alts > 0
+    cnt = pos.sum(axis=-1)
+    alt_mean = np.where(pos, alts, 0.0).sum(axis=-1) / np.maximum(cnt, 1)
+    scale = np.where(cnt > 0, np.maximum(alt_mean, EPS), 1.0)
+    scale = np.where(d > 0, np.maximum(d, EPS), scale)
+    return scale.astype(np.float32)
+
+
+def _arm_scale_ref(arm_xyz):
+    """手臂尺度：左右 肩-腕 距離中大於 0 者的平均，都沒有則為 1。"""
+    d = _safe_dist(arm_xyz[..., 0, :], arm_xyz[..., 2, :])
+    pos = d > 0
+    cnt = pos.sum(axis=-1)
+    mean = np.where(pos, d, 0.0).sum(axis=-1) / np.maximum(cnt, 1)
+    scale = np.where(cnt > 0, np.maximum(mean, EPS), 1.0)
+    return scale.astype(np.float32)
+
+
+# ==================== 特徵計算 ====================
+def compute_hand_edge_distances(hand_xyz):
+    """(..., 21, 3) -> (..., 23)"""
+    hand_xyz = np.asarray(hand_xyz, dtype=np.float32)
+    scale = _hand_scale_ref(hand_xyz)
+    d = _safe_dist(hand_xyz[..., _HAND_I, :], hand_xyz[..., _HAND_J, :])
+    return d / scale[..., None]
+
+
+def compute_hand_edge_directions(hand_xyz):
+    """(..., 21, 3) -> (..., 69)"""
+    hand_xyz = np.asarray(hand_xyz, dtype=np.float32)
+    scale = _hand_scale_ref(hand_xyz)
+    p_i = hand_xyz[..., _HAND_I, :]
+    p_j = hand_xyz[..., _HAND_J, :]
+    valid = (p_i.sum(axis=-1) != 0.0) & (p_j.sum(axis=-1) != 0.0)
+    vecs = np.where(valid[..., None], (p_j - p_i) / scale[..., None, None], 0.0)
+    return vecs.reshape(vecs.shape[:-2] + (-1,)).astype(np.float32)
+
+
+def compute_arm_edge_distances(arm_xyz):
+    """(..., 2, 3, 3) -> (..., 6)"""
+    arm_xyz = np.asarray(arm_xyz, dtype=np.float32)
+    scale = _arm_scale_ref(arm_xyz)
+    d = _safe_dist(arm_xyz[..., _ARM_SIDE, _ARM_I, :], arm_xyz[..., _ARM_SIDE, _ARM_J, :])
+    return d / scale[..., None]
+
+
+def extract_features(lh_xyz, rh_xyz, feat_dim, arm_xyz=None, scaler=None):
+    """
+    由左右手（及手臂）座標計算指定維度的特徵。
+    lh_xyz / rh_xyz: (..., 21, 3)；arm_xyz: (..., 2, 3, 3)，僅 52 維需要
+    回傳 (..., feat_dim) 的 float32 陣列
+    """
+    lh_xyz = np.asarray(lh_xyz, dtype=np.float32)
+    rh_xyz = np.asarray(rh_xyz, dtype=np.float32)
+
+    if feat_dim == 126:
+        lead = lh_xyz.shape[:-2]
+        feat = np.concatenate([lh_xyz.reshape(lead + (-1,)), rh_xyz.reshape(lead + (-1,))], axis=-1)
+    elif feat_dim == 46:
+        feat = np.concatenate([
+            compute_hand_edge_distances(lh_xyz),
+            compute_hand_edge_distances(rh_xyz),
+        ], axis=-1)
+    elif feat_dim == 52:
+        if arm_xyz is None:
+            arm_xyz = np.zeros(lh_xyz.shape[:-2] + (2, 3, 3), dtype=np.float32)
+        feat = np.concatenate([
+            compute_hand_edge_distances(lh_xyz),
+            compute_hand_edge_distances(rh_xyz),
+            compute_arm_edge_distances(arm_xyz),
+        ], axis=-1)
+    elif feat_dim == 138:
+        feat = np.concatenate([
+            compute_hand_edge_directions(lh_xyz),
+            compute_hand_edge_directions(rh_xyz),
+        ], axis=-1)
+    else:
+        raise ValueError(f"不支援的特徵維度：{feat_dim}")
+
+    if scaler is not None and scaler.n_features == feat.shape[-1]:
+        feat = scaler.transform(feat)
+    return feat.astype(np.float32, copy=False)
+
+
+def extract_features_from_mediapipe(results, feat_dim, scaler=None):
+    """單一 frame 的 MediaPipe Holistic 結果 -> (feat_dim,)"""
+    lh_xyz = hand_xyz_from_results(results.left_hand_landmarks)
+    rh_xyz = hand_xyz_from_results(results.right_hand_landmarks)
+    arm_xyz = arm_xyz_from_results(results.pose_landmarks) if feat_dim == 52 else None
+    return extract_features(lh_xyz, rh_xyz, feat_dim, arm_xyz=arm_xyz, scaler=scaler)
+
+
+# ==================== Scaler ====================
+class FeatureScaler:
+    """
+    StandardScaler 的輕量版本：只保留 mean / scale 陣列，
+    transform 為單純的 numpy 廣播運算，可直接套用在單一 frame 或整個 batch。
+    """
+
+    def __init__(self, mean, scale):
+        self.scale = np.asarray(scale, dtype=np.float32)
+        self.mean = (np.zeros_like(self.scale) if mean is None
+                     else np.asarray(mean, dtype=np.float32))
+        self._inv_scale = (1.0 / self.scale).astype(np.float32)
+
+    @property
+    def n_features(self):
+        return int(self.scale.shape[-1])
+
+    @classmethod
+    def from_sklearn(cls, scaler):
+        scale = getattr(scaler, "scale_", None)
+        mean = getattr(scaler, "mean_", None)
+        if scale is None:
+            n = len(mean) if mean is not None else int(scaler.n_features_in_)
+            scale = np.ones(n, dtype=np.float32)
+        return cls(mean, scale)
+
+    @classmethod
+    def load(cls, path):
+        """讀取 joblib 存的 sklearn scaler；檔案不存在時回傳 None。"""
+        if not path or not os.path.exists(path):
+            return None
+        import joblib
+        return cls.from_sklearn(joblib.load(path))
+
+    def transform(self, feat):
+        return (np.asarray(feat, dtype=np.float32) - self.mean) * self._inv_scale
@@ -0,0 +1,81 @@
+"""
+前端 MediaPipe 關節點的二進位傳輸格式
+比 JSON 的 {x, y, z} 物件陣列小很多，伺服器端可直接 np.frombuffer 不需逐點解析。
+
+格式（little-endian）：
+    header 12 bytes
+        magic     4s   b'SLF1'
+        version   u8   1
+        dtype     u8   1 = float16, 2 = float32
+        n_frames  u16
+        n_points  u16  每個 frame 的點數，目前固定 48
+        reserved  u16
+    payload n_frames * 48 * 3 個數值，每個 frame 依序為
+        左手 21 點、右手 21 點、左臂 肩/肘/腕、右臂 肩/肘/腕，每點 (x, y, z)
+沒偵測到的手或手臂全部填 0（與伺服器端「全 0 = 未偵測」的慣例相同）。
+"""
+import struct
+import numpy as np
+
+MAGIC = b'SLF1'
+VERSION = 1
+HEADER = struct.Struct('<4sBBHHH')
+POINTS_PER_FRAME = 21 + 21 + 6
+MAX_FRAMES = 256  # 單次請求最多 frame 數（30 fps 約 8.5 秒），避免一個請求佔用大量記憶體
+
+DTYPES = {1: np.dtype('<f2'), 2: np.dtype('<f4')}
+DTYPE_CODES = {np.dtype('<f2'): 1, np.dtype('<f4'): 2}
+
+
+class WireFormatError(ValueError):
+    pass
+
+
+def max_payload_bytes(max_frames=MAX_FRAMES):
+    """max_frames 個 float32 frame 的封包大小上限；讀取請求本體前先用它檢查 Content-Length。"""
+    return HEADER.size + max_frames * POINTS_PER_FRAME * 3 * DTYPES[2].itemsize
+
+
+def decode_frames(buf):
+    """
+    bytes -> (lh_xyz, rh_xyz, arm_xyz)
+        lh_xyz / rh_xyz: (N, 21, 3)，arm_xyz: (N, 2, 3, 3)，皆為 float32
+    """
+    if len(buf) < HEADER.size:
+        raise WireFormatError("資料長度不足")
+    magic, version, dtype_code, n_frames, n_points, _ = HEADER.unpack_from(buf)
+    if magic != MAGIC or version != VERSION:
+        raise WireFormatError("不支援的格式或版本")
+    if dtype_code not in DTYPES:
+        raise WireFormatError(f"不支援的數值型別：{dtype_code}")
+    if n_points != POINTS_PER_FRAME:
+        raise WireFormatError(f"每個 frame 應為 {POINTS_PER_FRAME} 點，收到 {n_points}")
+    if n_frames > MAX_FRAMES:
+        raise WireFormatError(f"單次最多 {MAX_FRAMES} 個 frame，收到 {n_frames}")
+
+    dtype = DTYPES[dtype_code]
+    count = n_frames * n_points * 3
+    if len(buf) != HEADER.size + count * dtype.itemsize:
+        raise WireFormatError("資料長度與 header 不符")
+
+    data = np.frombuffer(buf, dtype=dtype, count=count, offset=HEADER.size)
+    data = data.astype(np.float32).reshape(n_frames, n_points, 3)
+    lh_xyz = data[:, :21]
+    rh_xyz = data[:, 21:42]
+    arm_xyz = data[:, 42:].reshape(n_frames, 2, 3, 3)
+    return lh_xyz, rh_xyz, arm_xyz
+
+
+def encode_frames(lh_xyz, rh_xyz, arm_xyz=None, dtype=np.float16):
+    """decode_frames 的反向；供測試工具或 Python 端的模擬客戶端使用。"""
+    lh_xyz = np.asarray(lh_xyz, dtype=np.float32).reshape(-1, 21, 3)
+    rh_xyz = np.asarray(rh_xyz, dtype=np.float32).reshape(-1, 21, 3)
+    n_frames = lh_xyz.shape[0]
+    if arm_xyz is None:
+        arm_xyz = np.zeros((n_frames, 6, 3), dtype=np.float32)
+    arm_xyz = np.asarray(arm_xyz, dtype=np.float32).reshape(n_frames, 6, 3)
+
+    dtype = np.dtype(dtype).newbyteorder('<')
+    payload = np.concatenate([lh_xyz, rh_xyz, arm_xyz], axis=1).astype(dtype)
+    header = HEADER.pack(MAGIC, VERSION, DTYPE_CODES[dtype], n_frames, POINTS_PER_FRAME, 0)
+    return header + payload.tobytes()
@@ -0,0 +1,335 @@
+"""
+非同步、共用連線池的 LLM client（兩個翻譯方向共用）
+以前 /translateSign 與 /api/translate-sign 直接同步呼叫 client.chat.completions.create，
+沒有逾時：OpenRouter 一慢，Flask worker 就被卡住，其他櫃台的請求也跟著排隊。
+
+現在：
+    - 背景 thread 跑一個 asyncio event loop，所有請求共用 AsyncOpenAI 的 httpx 連線池
+    - 每個請求都有期限（LLM_TIMEOUT 秒，含排隊時間），逾時就放棄
+    - 同時最多 LLM_MAX_CONCURRENCY 個請求（asyncio.Semaphore），其餘排隊
+    - circuit breaker：連續失敗 LLM_BREAKER_FAILURES 次後暫停 LLM_BREAKER_RESET 秒，
+      期間直接失敗、不再等逾時；時間到放一個請求試探（half-open），成功才恢復；
+      試探請求被取消（串流中途停止、呼叫端逾時）時不算成敗，下一個請求重新試探
+失敗時丟出 LLMUnavailable，由呼叫端改用字典翻譯或原始手語語序等降級結果。
+
+LLM_BASE_URL 可指向本機 stub server 測試逾時與 breaker：
+    python llm_client.py stub --port 8089 --delay 3
+    LLM_BASE_URL=http://127.0.0.1:8089/v1 LLM_TIMEOUT=1 python app.py
+"""
+import asyncio
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from collections import deque
+
+DEFAULT_BASE_URL = "https://openrouter.ai/api/v1"
+
+
+class LLMUnavailable(Exception):
+    """逾時、circuit breaker 開啟或遠端錯誤；呼叫端應改用降級結果。"""
+
+
+class CircuitBreaker:
+    CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == self.OPEN:
+                if time.monotonic() - self.opened_at < self.reset_timeout:
+                    self.rejected += 1
+                    return False
+                self.state = self.HALF_OPEN  # 放一個請求試探
+                return True
+            if self.state == self.HALF_OPEN:
+                self.rejected += 1
+                return False  # 試探中的請求還沒回來
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+    def release(self):
+        """請求被取消、沒有成功或失敗的結果：若它是試探請求，讓下一個請求立刻重新試探。"""
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self.state = self.OPEN
+                self.opened_at = time.monotonic() - self.reset_timeout
+
+    def stats(self):
+        return {'state': self.state, 'failures': self.failures, 'rejected': self.rejected}
+
+
+class LLMClient:
+    def __init__(self, api_key=None, base_url=None, timeout=None, max_concurrency=None, breaker=None):
+        self.api_key = api_key or os.getenv("OPENROUTER_API_KEY") or "EMPTY"
+        self.base_url = base_url or os.getenv("LLM_BASE_URL", DEFAULT_BASE_URL)
+        self.timeout = timeout or float(os.getenv("LLM_TIMEOUT", "15"))
+        self.max_concurrency = max_concurrency or int(os.getenv("LLM_MAX_CONCURRENCY", "4"))
+        self.breaker = breaker or CircuitBreaker(int(os.getenv("LLM_BREAKER_FAILURES", "5")),
+                                                 float(os.getenv("LLM_BREAKER_RESET", "30")))
+        self._latencies = deque(maxlen=1000)  # 毫秒
+        self._first_token = deque(maxlen=1000)  # 串流模式第一段文字的延遲（毫秒）
+        self._counts = {'ok': 0, 'timeout': 0, 'error': 0, 'rejected': 0}
+        self._in_flight = 0
+        self._loop = asyncio.new_event_loop()
+        self._client = None
+        self._semaphore = None
+        self._thread = threading.Thread(target=self._loop.run_forever, name="llm-client", daemon=True)
+        self._thread.start()
+
+    def _ensure_client(self):
+        # 在 event loop 的 thread 內建立，連線池與 semaphore 都綁在同一個 loop
+        if self._client is None:
+            from openai import AsyncOpenAI
+
+            # 同一個 AsyncOpenAI 內部共用 keep-alive 連線池；重試交給期限與 breaker 處理
+            self._client = AsyncOpenAI(api_key=self.api_key, base_url=self.base_url, max_retries=0)
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._client
+
+    async def _create(self, model, messages, stream=False):
+        client = self._ensure_client()
+        async with self._semaphore:
+            self._in_flight += 1
+            try:
+                return await client.chat.completions.create(model=model, messages=messages, stream=stream)
+            finally:
+                self._in_flight -= 1
+
+    async def acomplete(self, model, messages, timeout=None):
+        """在 event loop 內呼叫：回傳回覆文字，失敗時丟出 LLMUnavailable。"""
+        if not self.breaker.allow():
+            self._counts['rejected'] += 1
+            raise LLMUnavailable("circuit breaker 開啟中")
+        t0 = time.perf_counter()
+        settled = False  # breaker 是否已記錄這次請求的結果
+        try:
+            resp = await asyncio.wait_for(self._create(model, messages), timeout or self.timeout)
+            settled = True
+        except asyncio.TimeoutError:
+            settled = True
+            self._counts['timeout'] += 1
+            self.breaker.record_failure()
+            raise LLMUnavailable(f"超過 {timeout or self.timeout:.1f} 秒未回應")
+        except Exception as e:
+            settled = True
+            self._counts['error'] += 1
+            self.breaker.record_failure()
+            raise LLMUnavailable(str(e)) from e
+        finally:
+            if not settled:
+                # 被取消（CancelledError 不是 Exception）：沒有結果，交還試探名額，breaker 不會卡在 half-open
+                self.breaker.release()
+        self._latencies.append((time.perf_counter() - t0) * 1000.0)
+        self._counts['ok'] += 1
+        self.breaker.record_success()
+        return (resp.choices[0].message.content or "").strip()
+
+    def complete(self, model, messages, timeout=None):
+        """同步介面（Flask route 用）：最多等到期限，之後丟出 LLMUnavailable。"""
+        timeout = timeout or self.timeout
+        future = asyncio.run_coroutine_threadsafe(self.acomplete(model, messages, timeout), self._loop)
+        try:
+            # 多留一點時間給 event loop 本身的排程
+            return future.result(timeout + 1.0)
+        except LLMUnavailable:
+            raise
+        except Exception as e:
+            future.cancel()
+            raise LLMUnavailable(str(e)) from e
+
+    async def _astream(self, model, messages, out, timeout):
+        """在 event loop 內呼叫：每段文字放進 out（queue.Queue），結束放 None，失敗放 LLMUnavailable。"""
+        if not self.breaker.allow():
+            self._counts['rejected'] += 1
+            out.put(LLMUnavailable("circuit breaker 開啟中"))
+            return
+        t0 = time.perf_counter()
+        first = True
+        settled = False  # breaker 是否已記錄這次請求的結果
+        try:
+            # 期限分兩段：等到第一段文字，以及每兩段文字之間
+            resp = await asyncio.wait_for(self._create(model, messages, stream=True), timeout)
+            chunks = resp.__aiter__()
+            while True:
+                try:
+                    chunk = await asyncio.wait_for(chunks.__anext__(), timeout)
+                except StopAsyncIteration:
+                    break
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if delta:
+                    if first:
+                        self._first_token.append((time.perf_counter() - t0) * 1000.0)
+                        first = False
+                    out.put(delta)
+            settled = True
+        except asyncio.TimeoutError:
+            settled = True
+            self._counts['timeout'] += 1
+            self.breaker.record_failure()
+            out.put(LLMUnavailable(f"超過 {timeout:.1f} 秒未回應"))
+            return
+        except asyncio.CancelledError:
+            out.put(LLMUnavailable("已取消"))
+            raise
+        except Exception as e:
+            settled = True
+            self._counts['error'] += 1
+            self.breaker.record_failure()
+            out.put(LLMUnavailable(str(e)))
+            return
+        finally:
+            if not settled:
+                self.breaker.release()  # 被取消（例如推測翻譯被較新的句子取代）
+        self._latencies.append((time.perf_counter() - t0) * 1000.0)
+        self._counts['ok'] += 1
+        self.breaker.record_success()
+        out.put(None)
+
+    def stream(self, model, messages, timeout=None):
+        """同步 generator：LLM 產生一段就 yield 一段；失敗丟出 LLMUnavailable。中途停止迭代會取消遠端請求。"""
+        timeout = timeout or self.timeout
+        out = queue.Queue()
+        future = asyncio.run_coroutine_threadsafe(self._astream(model, messages, out, timeout), self._loop)
+        try:
+            while True:
+                try:
+                    item = out.get(timeout=timeout + 1.0)
+                except queue.Empty:
+                    raise LLMUnavailable(f"超過 {timeout:.1f} 秒未回應")
+                if item is None:
+                    return
+                if isinstance(item, LLMUnavailable):
+                    raise item
+                yield item
+        finally:
+            future.cancel()
+
+    def stats(self):
+        lat = sorted(self._latencies)
+        pct = (lambda p: lat[min(len(lat) - 1, int(p * len(lat)))] if lat else 0.0)
+        first_token = sorted(self._first_token)
+        return {
+            'base_url': self.base_url,
+            'timeout_s': self.timeout,
+            'max_concurrency': self.max_concurrency,
+            'in_flight': self._in_flight,
+            **self._counts,
+            'p50_ms': pct(0.50),
+            'p99_ms': pct(0.99),
+            'first_token_p50_ms': first_token[len(first_token) // 2] if first_token else 0.0,
+            'breaker': self.breaker.stats(),
+        }
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_llm_client():
+    """process 內共用的 client；第一次呼叫時讀取環境變數（請先 load_dotenv）。"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = LLMClient()
+        return _client
+
+
+# ==================== 測試用 stub server ====================
+def run_stub_server(port=8089, delay=0.0, reply="好 歡迎 人來 銀行", fail_rate=0.0, chunk_delay=0.05):
+    """模擬 OpenAI 相容的 /v1/chat/completions（含 stream 模式），可設定延遲與失敗比例。"""
+    import random
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            length = int(self.headers.get('Content-Length', 0))
+            body = json.loads(self.rfile.read(length) or b'{}')
+            time.sleep(delay)
+            if random.random() < fail_rate:
+                self.send_response(500)
+                self.end_headers()
+                return
+            if body.get('stream'):
+                return self._stream(body)
+            payload = {
+                'id': 'stub', 'object': 'chat.completion', 'created': int(time.time()),
+                'model': body.get('model', 'stub'),
+                'choices': [{'index': 0, 'finish_reason': 'stop',
+                             'message': {'role': 'assistant', 'content': reply}}],
+            }
+            data = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+            try:
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # client 已逾時放棄
+
+        def _stream(self, body):
+            # OpenAI 相容的 SSE 串流：每個字一個 chunk
+            try:
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/event-stream')
+                self.end_headers()
+                for ch in reply:
+                    chunk = {'id': 'stub', 'object': 'chat.completion.chunk', 'created': int(time.time()),
+                             'model': body.get('model', 'stub'),
+                             'choices': [{'index': 0, 'delta': {'content': ch}, 'finish_reason': None}]}
+                    self.wfile.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode('utf-8'))
+                    self.wfile.flush()
+                    time.sleep(chunk_delay)
+                self.wfile.write(b"data: [DONE]\n\n")
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+
+        def log_message(self, fmt, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', port), Handler)
+    print(f"🚀 LLM stub server：http://127.0.0.1:{port}/v1（延遲 {delay} s）")
+    server.serve_forever()
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="LLM client 工具")
+    sub = parser.add_subparsers(dest='cmd', required=True)
+
+    p_stub = sub.add_parser('stub', help='啟動本機 OpenAI 相容 stub server')
+    p_stub.add_argument('--port', type=int, default=8089)
+    p_stub.add_argument('--delay', type=float, default=0.0)
+    p_stub.add_argument('--reply', default="好 歡迎 人來 銀行")
+    p_stub.add_argument('--fail-rate', type=float, default=0.0)
+    p_stub.add_argument('--chunk-delay', type=float, default=0.05, help='串流模式每個字之間的延遲')
+
+    args = parser.parse_args(argv)
+    run_stub_server(args.port, args.delay, args.reply, args.fail_rate, args.chunk_delay)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
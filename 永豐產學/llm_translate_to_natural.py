@@ -1,84 +1,89 @@
 import os
-import re
-import jieba
-import faiss
-import numpy as np
-from docx import Document
-from zhconv import convert
-from langdetect import detect
-from typing import Dict, List, Tuple
+from typing import Dict, Iterator, List
 from dotenv import load_dotenv
-from deep_translator import GoogleTranslator
-from sentence_transformers import SentenceTransformer
-from openai import OpenAI
+from llm_client import LLMUnavailable, get_llm_client
+from embedding_service import get_corpus_registry
+from semantic_cache import get_semantic_cache
+from sign_dictionary import get_sign_dictionary
+from translation_cache import SIGN_TO_NATURAL, get_translation_cache
+from traditional_chinese import StreamingConverter, ensure_traditional_chinese  # 離線、批次的繁體轉換
 
 # === 🔐 載入 API 金鑰與模型設定 ===
-load_dotenv(dotenv_path="App/.env")
-api_key = os.getenv("OPENROUTER_API_KEY")
-base_url = "https://openrouter.ai/api/v1"
-client = OpenAI(api_key=api_key, base_url=base_url)
-
-# === 載入語料庫並建立 FAISS 向量索引 ===
-corpus_path = "rag_sentence.docx"
-embedder = SentenceTransformer("shibing624/text2vec-base-chinese")
-
-def load_corpus_from_docx(file_path, max_len=80) -> List[str]:
-    doc = Document(file_path)
-    chunks = []
-    for para in doc.paragraphs:
-        text = para.text.strip()
-        if not text:
-            continue
-        words = list(jieba.cut(text))
-        cur = []
-        for w in words:
-            cur.append(w)
-            if len("".join(cur)) >= max_len:
-                chunks.append("".join(cur))
-                cur = []
-        if cur:
-            chunks.append("".join(cur))
-    return chunks
-
-corpus = load_corpus_from_docx(corpus_path)
-corpus_embeddings = embedder.encode(corpus, convert_to_numpy=True)
-dimension = corpus_embeddings.shape[1]
-index = faiss.IndexFlatL2(dimension)
-index.add(corpus_embeddings)
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+load_dotenv(dotenv_path=os.path.join(BASE_DIR, "App", ".env"))  # 不受目前工作目錄影響
+llm = get_llm_client()  # 共用連線池、有逾時與 circuit breaker（見 llm_client.py）
+LLM_MODEL = "qwen/qwen2.5-vl-72b-instruct"
+translation_cache = get_translation_cache()
+semantic_cache = get_semantic_cache()
+
+# === 語料索引與 embedding 模型由 embedding_service 共用（第一次檢索時才載入）===
+CORPUS_NAME = "rag_sentence"
+registry = get_corpus_registry()
 
 def retrieve_relevant_sentences(query: str, k=5) -> List[str]:
-    q_emb = embedder.encode([query], convert_to_numpy=True)
-    D, I = index.search(q_emb, k)
-    # 只保留相似度高於門檻的句子
-    threshold = 0.6
-    filtered = [corpus[i] for d, i in zip(D[0], I[0]) if d < threshold]
-    if not filtered:
-        filtered = [query]
-
-    return filtered
-
-
-def ensure_traditional_chinese(text: str) -> Tuple[str, List[Dict[str, str]]]:
-    translator = GoogleTranslator(source='auto', target='zh-TW')
-    records = []
-    words = text.split()
-    result = []
-    for word in words:
-        try:
-            if not re.match('^[\u4e00-\u9fff\s，。！？、]+$', word):
-                lang = detect(word)
-                if lang not in ('zh-tw', 'zh-cn'):
-                    trans = translator.translate(word)
-                    records.append({'original': word, 'translated': trans, 'detected_lang': lang})
-                    word = trans
-            word = convert(word, 'zh-hant')
-        except Exception:
-            pass
-        result.append(word)
-    return ' '.join(result), records
+    # cosine 相似度低於門檻（RAG_MIN_SIMILARITY）的句子不放進提示詞
+    return [chunk for chunk, _ in registry.search(CORPUS_NAME, query, k)]
+
+
+def retrieve_many(queries: List[str], k=5) -> List[List[str]]:
+    # 多筆查詢一起 encode（快取命中的不重算）
+    return [[chunk for chunk, _ in hits] for hits in registry.retrieve_many(CORPUS_NAME, queries, k)]
+
 
 # === 供外部使用的主函數 ===
-def translate_to_natural(user_message: str) -> str:
+def translate_to_natural(user_message: str, fallback: bool = True) -> str:
+    # 相同輸入（同模型、同語料版本）直接回傳快取的翻譯；
+    # 否則與預先翻譯好的劇本句子夠相近時沿用其翻譯，都沒有才呼叫 LLM
+    try:
+        return translation_cache.get_or_compute(
+            SIGN_TO_NATURAL, user_message, LLM_MODEL, registry.version(CORPUS_NAME),
+            lambda: semantic_cache.lookup(SIGN_TO_NATURAL, user_message, LLM_MODEL) or _translate_to_natural(user_message))
+    except LLMUnavailable as e:
+        if not fallback:  # 批次翻譯：失敗就丟出，之後續跑時重試
+            raise
+        # LLM 逾時或暫停使用：查手語字典，查不到就回傳原本的手語語序（降級結果不寫入快取）
+        print(f"⚠️ LLM 無法使用，改用字典翻譯: {e}")
+        return get_sign_dictionary().to_natural_language(user_message)
+
+
+def translate_to_natural_stream(user_message: str, fallback: bool = True) -> Iterator[str]:
+    """串流版：LLM 產生一段就 yield 一段繁體中文；完整結果同樣寫入翻譯快取。"""
+    sent = False
+    try:
+        for piece in translation_cache.get_or_stream(
+                SIGN_TO_NATURAL, user_message, LLM_MODEL, registry.version(CORPUS_NAME),
+                lambda: _stream_to_natural(user_message)):
+            sent = True
+            yield piece
+    except LLMUnavailable as e:
+        if sent or not fallback:
+            raise  # 已經送出部分內容：讓呼叫端知道結果不完整（SSE 送 event: error）
+        print(f"⚠️ LLM 無法使用，改用字典翻譯: {e}")
+        yield get_sign_dictionary().to_natural_language(user_message)
+
+
+def _stream_to_natural(user_message: str) -> Iterator[str]:
+    cached = semantic_cache.lookup(SIGN_TO_NATURAL, user_message, LLM_MODEL)
+    if cached:
+        yield cached
+        return
+    converter = StreamingConverter()  # 每段都先轉成繁體再送出
+    for delta in llm.stream(LLM_MODEL, build_messages(user_message)):
+        piece = converter.feed(delta)
+        if piece:
+            yield piece
+    rest = converter.flush()
+    if rest:
+        yield rest
+
+
+def _translate_to_natural(user_message: str) -> str:
+    bot_reply = llm.complete(LLM_MODEL, build_messages(user_message))
+    converted_reply, _ = ensure_traditional_chinese(bot_reply)
+    return converted_reply
+
+
+def build_messages(user_message: str) -> List[Dict[str, str]]:
     # ✅ 對短句不檢索，直接翻譯
     if len(user_message.strip().split()) <= 1:
         related = []
@@ -113,17 +118,9 @@ def translate_to_natural(user_message: str) -> str:
 {user_message}
 """
 
-    messages = [
+    return [
         {"role": "system", "content": system_prompt},
         {"role": "user", "content": user_message}
     ]
 
-    resp = client.chat.completions.create(
-        model="qwen/qwen2.5-vl-72b-instruct",
-        messages=messages
-    )
-    bot_reply = resp.choices[0].message.content.strip()
-    converted_reply, _ = ensure_traditional_chinese(bot_reply)
-    return converted_reply
-
 llm_translate_to_natural = translate_to_natural
\ No newline at end of file
@@ -0,0 +1,83 @@
+"""
+有序、有上限的 per-session 訊息紀錄
+取代「存一個全域變數、第一次 GET 就清空」的做法：
+每則訊息有遞增的 seq，讀取端自己帶 cursor（since=<seq>）取之後的訊息，
+多個讀取端可以各自完整讀到同一串訊息，不會互相搶走。
+
+記憶體上限：每個 session 最多保留 max_messages 則，最多 max_sessions 個 session（LRU 淘汰）。
+seq 由整個 MessageLog 共用的計數器產生（同一 session 內遞增但不一定連續）：
+session 被淘汰後重建也不會從 1 重新編號，客戶端手上的 cursor（含 SSE 的 Last-Event-ID）不會漏掉新訊息。
+"""
+import threading
+import time
+from collections import OrderedDict, deque
+
+DEFAULT_SESSION = 'default'
+
+
+class _SessionLog:
+    def __init__(self, max_messages):
+        self.messages = deque(maxlen=max_messages)
+        self.last_seq = 0
+
+
+class MessageLog:
+    def __init__(self, max_messages=256, max_sessions=128):
+        self.max_messages = max_messages
+        self.max_sessions = max_sessions
+        self._sessions = OrderedDict()
+        self._seq = 0   # 所有 session 共用，只增不減
+        self._cond = threading.Condition()
+
+    def _session(self, session_id, create=False):
+        log = self._sessions.get(session_id)
+        if log is None and create:
+            log = self._sessions[session_id] = _SessionLog(self.max_messages)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+        if log is not None:
+            self._sessions.move_to_end(session_id)
+        return log
+
+    def append(self, session_id, data):
+        """新增一則訊息，回傳它的 seq。"""
+        with self._cond:
+            log = self._session(session_id, create=True)
+            self._seq += 1
+            log.last_seq = self._seq
+            log.messages.append({'seq': log.last_seq, 'time': time.time(), **data})
+            self._cond.notify_all()
+            return log.last_seq
+
+    def read(self, session_id, since=0, limit=None):
+        """
+        回傳 (messages, cursor)：seq 大於 since 的訊息（由舊到新）與下一次該帶的 cursor。
+        since 早於保留範圍時，只能回傳仍保留的部分。
+        """
+        with self._cond:
+            log = self._session(session_id)
+            if log is None:
+                return [], since
+            messages = [m for m in log.messages if m['seq'] > since]
+            if limit is not None:
+                messages = messages[:limit]
+            cursor = messages[-1]['seq'] if messages else max(since, 0)
+            return messages, cursor
+
+    def last_seq(self, session_id):
+        with self._cond:
+            log = self._session(session_id)
+            return log.last_seq if log is not None else 0
+
+    def latest(self, session_id):
+        """最新一則訊息，沒有則為 None。"""
+        with self._cond:
+            log = self._session(session_id)
+            return log.messages[-1] if log is not None and log.messages else None
+
+    def wait(self, session_id, since=0, timeout=None):
+        """等到有 seq 大於 since 的訊息（或逾時），回傳 (messages, cursor)。"""
+        with self._cond:
+            self._cond.wait_for(lambda: self.last_seq(session_id) > since, timeout)
+        return self.read(session_id, since)
+
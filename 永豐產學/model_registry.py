@@ -0,0 +1,220 @@
+"""
+手語辨識模型註冊表
+整個 process 只載入一次模型並預熱，之後所有 /video_feed 連線共用同一份。
+推論後端（direct / tf.function / TFLite）由環境變數 SIGN_BACKEND 選擇，見 inference_backend.py。
+
+每個 .keras 旁邊可放同名的 manifest（例如 model_1126_3GRU.json）：
+    {
+        "sequence_length": 60,
+        "feat_dim": 52,
+        "labels": ["apply_for", "life", ...],
+        "scaler": "edges_scaler.joblib"     # 相對於 manifest 的路徑，可省略
+    }
+沒有 manifest 時才退回由模型輸入形狀與類別數推測。
+"""
+import os
+import json
+import threading
+import numpy as np
+
+from landmark_features import FeatureScaler
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MODEL_DIR = os.path.join(BASE_DIR, 'App', 'Model')
+
+# 依序嘗試，第一個能載入的就使用；可用環境變數 SIGN_MODEL_PATH 指定
+MODEL_CANDIDATES = [
+    "model_1126_2t.keras",  # 陳家祥：無法載入
+    "model_1126_1t2GRU.keras",  # 陳家祥：無法載入
+    "model_1126_2t1GRU.keras",  # 陳家祥：無法載入
+    "model_1126_3GRU.keras",  # 陳家祥：可以載入
+    "model_1104_4da_min_delta=5e-4.keras",
+    "model_1104_min_delta=5e-4.keras",
+    "model_1104_overfitting.keras",
+    "model_1104_twice_3da_min_delta=5e-4.keras",
+    "model_1104_3da_min_delta=5e-4.keras",
+    "model_1104_twice_2da_min_delta=5e-4.keras",
+    "model_1104_5da_min_delta=5e-4.keras",
+    "model_1104_twice_4da_min_delta=5e-4.keras",
+    "model3_2da_atten_with_arm.keras",
+    "model2_2da_with_arm.keras",
+    "model1_jnoise_with_arm.keras",
+    "yu2_2da_atten_0907.keras",
+    "yu1_2da_0907.keras",
+    "j1_0907_noise.keras",
+    "model_1123_5da.keras",
+    "model_hands4_v2.keras",  # 舊模型備用
+]
+
+# 沒有 manifest 的舊模型：依類別數對應動作標籤
+LEGACY_ACTIONS = {
+    5: ['apply_for', 'complete', 'no', 'problem', 'sign'],
+    7: ['apply_for', 'life', 'me', 'no', 'problem', 'save_money', 'use'],
+    8: ['apply_for', 'life', 'me', 'no', 'saving_book', 'problem', 'save_money', 'use'],
+    10: ['complete', 'this', 'id_card', 'paper', 'sign',
+         'cover_name', 'various', 'use', 'life', 'want'],
+    11: ['apply_for', 'life', 'me', 'no', 'saving_book',
+         'problem', 'save_money', 'use', 'id_card', 'ok', 'this'],
+    12: ['complete', 'apply_for', 'invest', 'cover_name', 'me',
+         'passbook', 'use', 'various', 'want', 'what', 'id_card', 'paper'],
+    24: ['0', '1', '2', '3', '4', '5', '6', '7', '8', '9',
+         'check', 'finish', 'give_you', 'good', 'i', 'id_card',
+         'is', 'money', 'saving_book', 'sign', 'taiwan', 'take',
+         'ten_thousand', 'yes'],
+}
+DEFAULT_ACTIONS = LEGACY_ACTIONS[5]
+LEGACY_SCALER = "edges_scaler.joblib"
+
+
+class SignModel:
+    """已載入（並預熱）的模型與其 metadata。"""
+
+    def __init__(self, path, model, sequence_length, feat_dim, labels, scaler=None, backend=None):
+        self.path = path
+        self.model = model
+        self.sequence_length = sequence_length
+        self.feat_dim = feat_dim
+        self.labels = np.array(labels)
+        self.scaler = scaler
+        self.backend = backend
+
+    @property
+    def num_classes(self):
+        return len(self.labels)
+
+    def predict(self, x):
+        """x: (batch, seq_len, feat_dim) -> (batch, num_classes)"""
+        if self.backend is None:
+            return self.model.predict(x, verbose=0)
+        return self.backend.predict(x)
+
+    def warm_up(self):
+        """先跑一次假資料，讓第一個真正的 frame 不用付 graph 建立的成本。"""
+        dummy = np.zeros((1, self.sequence_length, self.feat_dim), dtype=np.float32)
+        self.predict(dummy)
+
+
+def manifest_path_for(model_path):
+    return os.path.splitext(model_path)[0] + '.json'
+
+
+def read_manifest(model_path):
+    """讀取模型旁的 manifest；不存在時回傳 None。"""
+    path = manifest_path_for(model_path)
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _resolve(path):
+    return path if os.path.isabs(path) else os.path.join(MODEL_DIR, path)
+
+
+def load_keras_model(path):
+    # TensorFlow 很重，第一次真的要載入模型時才 import
+    from tensorflow.keras.models import load_model
+    from sign_model_layers import CUSTOM_OBJECTS
+    return load_model(path, custom_objects=CUSTOM_OBJECTS, compile=False)
+
+
+def _infer_from_model(model):
+    try:
+        in_shape = model.input.shape
+        sequence_length = int(in_shape[1]) if in_shape[1] is not None else 60
+        feat_dim = int(in_shape[2]) if in_shape[2] is not None else 52
+    except Exception:
+        sequence_length, feat_dim = 60, 52
+    try:
+        num_classes = int(model.output.shape[-1])
+    except Exception:
+        num_classes = 24
+    return sequence_length, feat_dim, num_classes
+
+
+def _make_backend(model, sequence_length, feat_dim, path):
+    """依 SIGN_BACKEND 建立推論後端，失敗時退回 direct。"""
+    from inference_backend import DEFAULT_BACKEND, make_backend
+    name = os.getenv("SIGN_BACKEND", DEFAULT_BACKEND)
+    try:
+        backend = make_backend(name, model, sequence_length, feat_dim, model_path=path)
+    except Exception as e:
+        print(f"⚠️ 無法建立推論後端 {name}：{e}，改用 direct")
+        backend = make_backend('direct', model, sequence_length, feat_dim)
+    print(f"⚙️ 推論後端：{backend.name}")
+    return backend
+
+
+def load_sign_model(path, warm_up=True):
+    """載入單一模型與其 manifest（不經過快取）。"""
+    path = _resolve(path)
+    model = load_keras_model(path)
+    manifest = read_manifest(path)
+
+    if manifest is not None:
+        sequence_length = int(manifest['sequence_length'])
+        feat_dim = int(manifest['feat_dim'])
+        labels = manifest['labels']
+        scaler_name = manifest.get('scaler')
+    else:
+        print(f"ℹ️ {os.path.basename(path)} 沒有 manifest，由模型形狀推測參數")
+        sequence_length, feat_dim, num_classes = _infer_from_model(model)
+        labels = LEGACY_ACTIONS.get(num_classes, DEFAULT_ACTIONS)
+        scaler_name = LEGACY_SCALER if feat_dim in (46, 52) else None
+
+    scaler = None
+    if scaler_name:
+        scaler_path = os.path.join(os.path.dirname(path), scaler_name)
+        try:
+            scaler = FeatureScaler.load(scaler_path)
+            if scaler is not None:
+                print(f"✅ 已載入 scaler：{scaler_path}")
+        except Exception as e:
+            print(f"ℹ️ 未載入 scaler: {e}")
+
+    backend = _make_backend(model, sequence_length, feat_dim, path)
+    sign_model = SignModel(path, model, sequence_length, feat_dim, labels, scaler, backend)
+    if warm_up:
+        sign_model.warm_up()
+    return sign_model
+
+
+_models = {}
+_default_path = None
+_lock = threading.Lock()
+
+
+def get_sign_model(path=None):
+    """
+    取得 process 內共用的模型。
+    path 為 None 時使用 SIGN_MODEL_PATH，否則依 MODEL_CANDIDATES 順序找第一個能載入的。
+    載入失敗回傳 None。
+    """
+    global _default_path
+    with _lock:
+        if path is not None:
+            path = _resolve(path)
+            if path not in _models:
+                _models[path] = load_sign_model(path)
+            return _models[path]
+
+        if _default_path is not None:
+            return _models[_default_path]
+
+        env_path = os.getenv("SIGN_MODEL_PATH")
+        candidates = [env_path] if env_path else MODEL_CANDIDATES
+        for name in candidates:
+            mpath = _resolve(name)
+            if not os.path.exists(mpath):
+                continue
+            try:
+                _models[mpath] = load_sign_model(mpath)
+            except Exception as e:
+                print(f"⚠️ 嘗試載入 {mpath} 失敗：{e}")
+                continue
+            _default_path = mpath
+            print(f"✅ 成功載入模型：{mpath}")
+            return _models[mpath]
+
+        print("❌ 無法載入任何模型")
+        return None
@@ -0,0 +1,161 @@
+"""
+RAG 語料索引的磁碟快取
+以前每次啟動都要：python-docx 解析 → jieba 切塊 → 整份語料重新 embedding → 建 FAISS 索引。
+現在把結果存到快取目錄，key 為（docx 內容雜湊、切塊參數、embedding 模型名稱）：
+    chunks.json      切好的語料
+    embeddings.npy   L2 正規化後的語料向量（以 mmap 方式載入）
+    index-<type>.faiss  faiss.write_index 寫出的索引，每種索引類型一份（見 retrieval.py）
+語料沒變就直接載入；docx、參數或模型任一改變才重建。快取目錄可用 RAG_CACHE_DIR 指定。
+"""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from typing import List
+
+import numpy as np
+
+from retrieval import DEFAULT_INDEX_TYPE, DEFAULT_MIN_SIMILARITY, build_index, configure_search, normalize, search
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+RAG_CACHE_DIR = os.getenv("RAG_CACHE_DIR", os.path.join(BASE_DIR, ".rag_cache"))
+
+# 切塊邏輯或快取內容格式改變時遞增，讓舊快取失效
+CACHE_VERSION = 2
+
+
+# === 載入並拆分劇本語料 ===
+def load_corpus_from_docx(file_path: str, max_len: int = 80) -> List[str]:
+    import jieba
+    from docx import Document
+
+    doc = Document(file_path)
+    chunks: List[str] = []
+    for para in doc.paragraphs:
+        text = para.text.strip()
+        if not text:
+            continue
+        words = list(jieba.cut(text))
+        cur: List[str] = []
+        for w in words:
+            cur.append(w)
+            if len("".join(cur)) >= max_len:
+                chunks.append("".join(cur))
+                cur = []
+        if cur:
+            chunks.append("".join(cur))
+    return chunks
+
+
+def corpus_key(docx_path: str, model_name: str, max_len: int = 80) -> str:
+    h = hashlib.sha256()
+    with open(docx_path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            h.update(block)
+    params = {'max_len': max_len, 'version': CACHE_VERSION, 'model': model_name}
+    h.update(json.dumps(params, sort_keys=True).encode('utf-8'))
+    return h.hexdigest()
+
+
+class RagIndex:
+    """一份語料：chunks、對應的（正規化）向量與 cosine 相似度的 FAISS 索引。"""
+
+    def __init__(self, chunks, embeddings, index, key=None, index_type=DEFAULT_INDEX_TYPE):
+        self.chunks = chunks
+        self.embeddings = embeddings
+        self.index = index
+        self.key = key
+        self.index_type = index_type
+
+    @property
+    def dimension(self):
+        return self.embeddings.shape[1]
+
+    def __len__(self):
+        return len(self.chunks)
+
+    def search(self, query_embeddings, k=5, min_similarity=DEFAULT_MIN_SIMILARITY):
+        """每筆查詢回傳 [(chunk, similarity), ...]，低於 min_similarity 的結果不列入。"""
+        return search(self.index, self.chunks, query_embeddings, k, min_similarity)
+
+
+def _save_corpus(cache_path, chunks, embeddings):
+    # 先寫到暫存目錄再整個改名，多個 process 同時重建也不會讀到寫一半的檔案
+    parent = os.path.dirname(cache_path)
+    os.makedirs(parent, exist_ok=True)
+    tmp = tempfile.mkdtemp(dir=parent, prefix='.tmp-')
+    try:
+        with open(os.path.join(tmp, 'chunks.json'), 'w', encoding='utf-8') as f:
+            json.dump(chunks, f, ensure_ascii=False)
+        np.save(os.path.join(tmp, 'embeddings.npy'), embeddings)
+        os.replace(tmp, cache_path)
+    except OSError:
+        # 其他 process 已先寫好同一份快取
+        shutil.rmtree(tmp, ignore_errors=True)
+        if not os.path.isdir(cache_path):
+            raise
+
+
+def _load_corpus(cache_path):
+    with open(os.path.join(cache_path, 'chunks.json'), encoding='utf-8') as f:
+        chunks = json.load(f)
+    embeddings = np.load(os.path.join(cache_path, 'embeddings.npy'), mmap_mode='r')
+    return chunks, embeddings
+
+
+def _load_or_build_index(cache_path, embeddings, index_type):
+    import faiss
+
+    path = os.path.join(cache_path, f'index-{index_type}.faiss')
+    if os.path.exists(path):
+        try:
+            return configure_search(faiss.read_index(path))
+        except Exception as e:
+            print(f"⚠️ FAISS 索引快取損毀，重新建立：{e}")
+    index = build_index(np.ascontiguousarray(embeddings), index_type)
+    try:
+        fd, tmp = tempfile.mkstemp(dir=cache_path, prefix='.tmp-', suffix='.faiss')
+        os.close(fd)
+        faiss.write_index(index, tmp)
+        os.replace(tmp, path)
+    except OSError as e:
+        print(f"⚠️ 無法寫入 FAISS 索引快取：{e}")
+    return index
+
+
+def load_rag_index(docx_path: str, encode, model_name: str, max_len: int = 80,
+                   index_type: str = DEFAULT_INDEX_TYPE, cache_dir: str = None) -> RagIndex:
+    """
+    載入（或建立並快取）docx 語料的索引。
+    encode(chunks) -> np.ndarray 只在需要重建時才會被呼叫，所以快取命中時不必先載入 embedding 模型。
+    """
+    key = corpus_key(docx_path, model_name, max_len)
+    name = os.path.splitext(os.path.basename(docx_path))[0]
+    cache_path = os.path.join(cache_dir or RAG_CACHE_DIR, f"{name}-{key[:16]}")
+
+    corpus = None
+    if os.path.isdir(cache_path):
+        try:
+            corpus = _load_corpus(cache_path)
+            print(f"✅ 已載入 RAG 語料快取：{name}（{len(corpus[0])} 筆）")
+        except Exception as e:
+            print(f"⚠️ RAG 語料快取損毀，重新建立：{e}")
+            shutil.rmtree(cache_path, ignore_errors=True)
+
+    if corpus is None:
+        print(f"ℹ️ 建立 RAG 語料向量：{name}")
+        chunks = load_corpus_from_docx(docx_path, max_len=max_len)
+        embeddings = normalize(encode(chunks))
+        try:
+            _save_corpus(cache_path, chunks, embeddings)
+        except OSError as e:
+            print(f"⚠️ 無法寫入 RAG 語料快取：{e}")
+        corpus = chunks, embeddings
+
+    chunks, embeddings = corpus
+    if os.path.isdir(cache_path):
+        index = _load_or_build_index(cache_path, embeddings, index_type)
+    else:
+        index = build_index(np.ascontiguousarray(embeddings), index_type)
+    return RagIndex(chunks, embeddings, index, key, index_type)
@@ -0,0 +1,233 @@
+"""
+多階段手語辨識 pipeline
+    capture  → landmark → classify
+                  ↓
+               encode  → MJPEG
+
+每個階段一條 thread，之間只用「最新值」slot 或有界 queue 串接：
+- capture 只保留最新的 frame，處理不完的舊 frame 直接丟掉，不會越積越久
+- classify 把累積的特徵一次補進視窗後只推論一次，慢的時候自動降低推論頻率；
+  新詞直接 publish 到事件匯流排，不在任何階段做阻塞的 HTTP 呼叫
+- MJPEG 輸出只讀 encode 的最新結果，永遠不會等模型推論
+整體 FPS 由最慢的階段決定，而不是所有階段的總和。
+"""
+import queue
+import threading
+
+import cv2
+import numpy as np
+import mediapipe as mp
+
+from event_bus import SIGN_RESULT, get_event_bus
+from landmark_features import extract_features_from_mediapipe
+from sign_recognizer import SignRecognizer
+
+mp_holistic = mp.solutions.holistic
+mp_drawing = mp.solutions.drawing_utils
+
+
+def mediapipe_detection(image, model):
+    image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+    image.flags.writeable = False
+    return model.process(image)
+
+
+def draw_styled_landmarks(image, results):
+    mp_drawing.draw_landmarks(image, results.pose_landmarks, mp_holistic.POSE_CONNECTIONS)
+    mp_drawing.draw_landmarks(image, results.left_hand_landmarks, mp_holistic.HAND_CONNECTIONS)
+    mp_drawing.draw_landmarks(image, results.right_hand_landmarks, mp_holistic.HAND_CONNECTIONS)
+
+
+def encode_frame(frame):
+    """畫面下方加一條黑色空白區塊後編成 JPEG；失敗回傳 None。"""
+    img = np.zeros((40, frame.shape[1], 3), dtype='uint8')
+    output_frame = cv2.vconcat([frame, img])
+    ret, buffer = cv2.imencode('.jpg', output_frame)
+    return buffer.tobytes() if ret else None
+
+
+def mjpeg_chunk(frame_bytes):
+    return (b'--frame\r\n'
+            b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
+
+
+def publish_result(trans_result):
+    """有新詞就「立刻送出」：直接發到 process 內的事件匯流排（/handlanRes 與 SSE 訂閱者）。"""
+    get_event_bus().publish(SIGN_RESULT, {'msg': trans_result})
+
+
+class LatestSlot:
+    """只保存最新值的單格信箱；讀取端用版本號等待下一個新值。"""
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._value = None
+        self._version = 0
+        self._closed = False
+
+    def put(self, value):
+        with self._cond:
+            self._value = value
+            self._version += 1
+            self._cond.notify_all()
+
+    def get(self, last_version=0, timeout=None):
+        """等到版本大於 last_version；回傳 (version, value)，逾時或關閉時 value 為 None。"""
+        with self._cond:
+            self._cond.wait_for(lambda: self._version > last_version or self._closed, timeout)
+            if self._version <= last_version:
+                return last_version, None
+            return self._version, self._value
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+
+def _put_drop_oldest(q, item):
+    """有界 queue 滿了就丟掉最舊的一筆，生產端永遠不阻塞。"""
+    while True:
+        try:
+            q.put_nowait(item)
+            return
+        except queue.Full:
+            try:
+                q.get_nowait()
+            except queue.Empty:
+                pass
+
+
+class RecognitionPipeline:
+    def __init__(self, sign_model, on_update=publish_result, on_frame=None,
+                 camera_index=0, feature_queue_size=None):
+        self.sign_model = sign_model
+        self.recognizer = SignRecognizer(sign_model, on_update=on_update)
+        self.on_frame = on_frame  # 每張編碼好的 JPEG 都會呼叫（例如廣播給多個訂閱者）
+        self.camera_index = camera_index
+
+        self.raw_frames = LatestSlot()      # capture  → landmark
+        self.annotated = LatestSlot()       # landmark → encode
+        self.encoded = LatestSlot()         # encode   → MJPEG
+        # landmark → classify：最多保留一個視窗長度的特徵
+        self.features = queue.Queue(maxsize=feature_queue_size or sign_model.sequence_length)
+
+        self._stop = threading.Event()
+        self._threads = []
+        self._cap = None
+
+    # ==================== 生命週期 ====================
+    def start(self):
+        self._cap = cv2.VideoCapture(self.camera_index)
+        if not self._cap.isOpened():
+            print("❌ 無法開啟攝影機")
+            return False
+        for target in (self._capture_loop, self._landmark_loop,
+                       self._classify_loop, self._encode_loop):
+            t = threading.Thread(target=target, name=target.__name__, daemon=True)
+            t.start()
+            self._threads.append(t)
+        print("🎥 開始手語辨識（pipeline 模式）...")
+        return True
+
+    def stop(self):
+        self._stop.set()
+        for slot in (self.raw_frames, self.annotated, self.encoded):
+            slot.close()
+        for t in self._threads:
+            t.join(timeout=2.0)
+        self._threads = []
+        if self._cap is not None:
+            self._cap.release()
+            self._cap = None
+        print("🛑 手語辨識系統已停止")
+
+    @property
+    def running(self):
+        return not self._stop.is_set()
+
+    # ==================== 各階段 ====================
+    def _capture_loop(self):
+        while not self._stop.is_set():
+            ret, frame = self._cap.read()
+            if not ret:
+                break
+            self.raw_frames.put(cv2.flip(frame, 1))
+        self._stop.set()
+        self.raw_frames.close()
+
+    def _landmark_loop(self):
+        feat_dim = self.sign_model.feat_dim
+        scaler = self.sign_model.scaler
+        version = 0
+        with mp_holistic.Holistic(min_detection_confidence=0.5, min_tracking_confidence=0.5) as holistic:
+            while not self._stop.is_set():
+                version, frame = self.raw_frames.get(version, timeout=0.5)
+                if frame is None:
+                    continue
+                results = mediapipe_detection(frame, holistic)
+                draw_styled_landmarks(frame, results)
+                self.annotated.put(frame)
+                try:
+                    keypoints = extract_features_from_mediapipe(results, feat_dim, scaler)
+                except Exception as e:
+                    print(f"⚠️ 特徵提取錯誤: {e}")
+                    continue
+                _put_drop_oldest(self.features, keypoints)
+
+    def _classify_loop(self):
+        recognizer = self.recognizer
+        while not self._stop.is_set():
+            try:
+                keypoints = self.features.get(timeout=0.5)
+            except queue.Empty:
+                recognizer.tick()
+                continue
+            # 推論期間累積的特徵全部補進視窗，再只做一次推論
+            ready = recognizer.add_frame(keypoints)
+            while True:
+                try:
+                    ready = recognizer.add_frame(self.features.get_nowait())
+                except queue.Empty:
+                    break
+            if ready:
+                try:
+                    res = self.sign_model.predict(recognizer.window())[0]
+                    recognizer.apply_prediction(res)
+                except Exception as e:
+                    print(f"❌ 預測錯誤: {e}")
+            recognizer.tick()
+
+    def _encode_loop(self):
+        version = 0
+        while not self._stop.is_set():
+            version, frame = self.annotated.get(version, timeout=0.5)
+            if frame is None:
+                continue
+            frame_bytes = encode_frame(frame)
+            if frame_bytes is None:
+                continue
+            self.encoded.put(frame_bytes)
+            if self.on_frame is not None:
+                self.on_frame(frame_bytes)
+
+    # ==================== 輸出 ====================
+    def mjpeg(self):
+        """MJPEG generator：只取最新編碼好的畫面，不等推論。"""
+        version = 0
+        while self.running:
+            version, frame_bytes = self.encoded.get(version, timeout=1.0)
+            if frame_bytes is None:
+                continue
+            yield mjpeg_chunk(frame_bytes)
+
+
+def start_pipelined(sign_model):
+    """與 start() 相同的 MJPEG generator，但各階段平行執行。"""
+    pipeline = RecognitionPipeline(sign_model)
+    if not pipeline.start():
+        return
+    try:
+        yield from pipeline.mjpeg()
+    finally:
+        pipeline.stop()
@@ -0,0 +1,108 @@
+"""
+前端上傳關節點時的 per-session 辨識器
+每個 session（櫃台 / 瀏覽器分頁）各自有序列視窗、投票與句子狀態，共用同一個模型。
+閒置超過 ttl 秒的 session 會被回收。
+batching=True 時，所有 session 的推論經過同一個 micro-batch scheduler 合併執行。
+"""
+import threading
+import time
+
+from batch_scheduler import model_batcher
+from landmark_features import extract_features
+from sign_recognizer import SignRecognizer
+
+
+class RecognitionSession:
+    def __init__(self, session_id, recognizer):
+        self.session_id = session_id
+        self.recognizer = recognizer
+        self.last_seen = time.time()
+        self.lock = threading.Lock()  # 同一個 session 的 batch 依序處理
+
+
+class SessionManager:
+    def __init__(self, sign_model_loader, on_update=None, ttl=300.0, max_sessions=64,
+                 batching=True, max_batch=16, max_wait_ms=2.0):
+        self._load_model = sign_model_loader
+        self.on_update = on_update  # callback(session_id, trans_result)
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.batching = batching
+        self.max_batch = max_batch
+        self.max_wait_ms = max_wait_ms
+        self.scheduler = None
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def _predict_fn(self, sign_model):
+        if not self.batching:
+            return sign_model.predict
+        if self.scheduler is None:
+            self.scheduler = model_batcher(sign_model, self.max_batch, self.max_wait_ms)
+        return self.scheduler.run
+
+    def _evict_idle(self, now):
+        expired = [sid for sid, s in self._sessions.items() if now - s.last_seen > self.ttl]
+        for sid in expired:
+            del self._sessions[sid]
+        if len(self._sessions) >= self.max_sessions:
+            oldest = min(self._sessions.values(), key=lambda s: s.last_seen)
+            del self._sessions[oldest.session_id]
+
+    def get(self, session_id):
+        now = time.time()
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                sign_model = self._load_model()
+                if sign_model is None:
+                    return None
+                self._evict_idle(now)
+                on_update = None
+                if self.on_update is not None:
+                    on_update = lambda text, sid=session_id: self.on_update(sid, text)
+                recognizer = SignRecognizer(sign_model, on_update=on_update,
+                                            predict_fn=self._predict_fn(sign_model))
+                session = RecognitionSession(session_id, recognizer)
+                self._sessions[session_id] = session
+            session.last_seen = now
+            return session
+
+    def reset(self, session_id):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def process(self, session_id, lh_xyz, rh_xyz, arm_xyz=None):
+        """
+        處理一批 frame：(N, 21, 3) 的左右手與 (N, 2, 3, 3) 的手臂座標。
+        回傳 {"words": [這批新增的句子...], "sentence": 目前句子}；模型無法載入時回傳 None。
+        """
+        session = self.get(session_id)
+        if session is None:
+            return None
+        recognizer = session.recognizer
+        sign_model = recognizer.sign_model
+
+        # 整批一次算特徵
+        feats = extract_features(lh_xyz, rh_xyz, sign_model.feat_dim,
+                                 arm_xyz=arm_xyz, scaler=sign_model.scaler)
+        words = []
+        with session.lock:
+            for keypoints in feats:
+                result = recognizer.push(keypoints)
+                if result is not None:
+                    words.append(result)
+            recognizer.tick()
+            return {"words": words, "sentence": recognizer.trans_result}
+
+    def stats(self):
+        stats = {'sessions': len(self._sessions)}
+        if self.scheduler is not None:
+            stats['scheduler'] = self.scheduler.stats()
+        sessions = list(self._sessions.values())
+        if sessions and sessions[0].recognizer.sign_model.backend is not None:
+            stats['backend'] = sessions[0].recognizer.sign_model.backend.stats()
+        return stats
+
+    def __len__(self):
+        return len(self._sessions)
@@ -0,0 +1,248 @@
+"""
+語意翻譯快取：近似重複的輸入直接沿用預先翻譯好的結果
+rag_sentence.docx、rag_nlToSign.docx 與 sign_language_dic.txt 就是櫃台流程預期會出現的句子。
+離線先把每一句翻譯一次，連同輸入的句向量存起來；執行時若輸入與某句的 cosine similarity
+達到門檻（SEMANTIC_CACHE_THRESHOLD，預設 0.92），直接回傳那句的翻譯，不呼叫 LLM。
+
+儲存位置：RAG_CACHE_DIR/semantic/<方向>/
+    pairs.json      [{"input", "output", "source"}, ...]
+    embeddings.npy  輸入句的正規化向量
+    meta.json       embedding 模型、LLM 模型（由劇本直接取用時為 null）
+
+用法：
+    python semantic_cache.py build                  # 用 LLM 翻譯所有劇本句子
+    python semantic_cache.py build --from-script    # 不呼叫 LLM，直接採用劇本裡的對照翻譯
+"""
+import json
+import os
+import re
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+from embedding_service import DEFAULT_CORPORA, get_embedding_service, normalize_text
+from rag_index import RAG_CACHE_DIR
+from retrieval import build_index, normalize
+from sign_dictionary import load_pairs as load_dictionary_pairs
+from translation_cache import NATURAL_TO_SIGN, SIGN_TO_NATURAL
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+SPEECH_DIR = os.path.join(BASE_DIR, 'App', 'server', 'speech_recognition')
+SEMANTIC_CACHE_DIR = os.path.join(RAG_CACHE_DIR, 'semantic')
+THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92"))
+DIRECTIONS = (SIGN_TO_NATURAL, NATURAL_TO_SIGN)
+
+# 劇本格式：「手語：… 轉譯：…」與「自然中文：… 手語語序：…」
+SIGN_SCRIPT_RE = re.compile(r'手語：\s*(.+?)\s*轉譯：\s*(.+?)\s*(?=手語：|$)', re.S)
+NL_SCRIPT_RE = re.compile(r'自然中文：\s*(.+?)\s*手語語序：\s*(.+?)\s*(?=自然中文：|$)', re.S)
+
+
+# ==================== 劇本句子 ====================
+def docx_text(path):
+    from docx import Document
+
+    return '\n'.join(p.text for p in Document(path).paragraphs)
+
+
+def load_script_pairs():
+    """回傳 {方向: [(輸入, 劇本中的翻譯, 來源), ...]}，同方向內以正規化後的輸入去重。"""
+    found = {direction: [] for direction in DIRECTIONS}
+
+    def add(direction, source, text, reference):
+        found[direction].append((' '.join(text.split()), ' '.join(reference.split()), source))
+
+    text = docx_text(DEFAULT_CORPORA['rag_sentence'][0])
+    for sign, natural in SIGN_SCRIPT_RE.findall(text):
+        add(SIGN_TO_NATURAL, 'rag_sentence', sign, natural)
+    text = docx_text(DEFAULT_CORPORA['rag_nlToSign'][0])
+    for natural, sign in NL_SCRIPT_RE.findall(text):
+        add(NATURAL_TO_SIGN, 'rag_nlToSign', natural, sign)
+    for natural, sign in load_dictionary_pairs():
+        add(NATURAL_TO_SIGN, 'sign_language_dic', natural, sign)
+        add(SIGN_TO_NATURAL, 'sign_language_dic', sign, natural)
+
+    for direction, pairs in found.items():
+        seen = set()
+        unique = []
+        for text, reference, source in pairs:
+            key = normalize_text(text)
+            if key and key not in seen:
+                seen.add(key)
+                unique.append((text, reference, source))
+        found[direction] = unique
+    return found
+
+
+# ==================== 執行期查詢 ====================
+class _Store:
+    def __init__(self, pairs, embeddings, meta):
+        self.pairs = pairs
+        self.meta = meta
+        self.index = build_index(normalize(embeddings), 'flat')
+
+
+class SemanticCache:
+    def __init__(self, embedding_service, cache_dir=SEMANTIC_CACHE_DIR, threshold=THRESHOLD):
+        self.embeddings = embedding_service
+        self.cache_dir = cache_dir
+        self.threshold = threshold
+        self._stores = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _store(self, direction):
+        with self._lock:
+            if direction in self._stores:
+                return self._stores[direction]
+            store = None
+            path = os.path.join(self.cache_dir, direction)
+            try:
+                with open(os.path.join(path, 'meta.json'), encoding='utf-8') as f:
+                    meta = json.load(f)
+                if meta.get('embed_model') != self.embeddings.model_name:
+                    print(f"⚠️ 語意快取 {direction} 的 embedding 模型不同，請重新執行 semantic_cache.py build")
+                else:
+                    with open(os.path.join(path, 'pairs.json'), encoding='utf-8') as f:
+                        pairs = json.load(f)
+                    embeddings = np.load(os.path.join(path, 'embeddings.npy'))
+                    store = _Store(pairs, embeddings, meta)
+                    print(f"✅ 已載入語意快取：{direction}（{len(pairs)} 句）")
+            except FileNotFoundError:
+                pass
+            except Exception as e:
+                print(f"⚠️ 無法載入語意快取 {direction}: {e}")
+            self._stores[direction] = store
+            return store
+
+    def lookup(self, direction, text, llm_model=None):
+        """最相近的預翻譯句子達到門檻就回傳它的翻譯，否則 None。"""
+        store = self._store(direction)
+        if store is None or not store.pairs:
+            return None
+        # 用其他 LLM 模型預翻譯的結果不沿用（劇本直接取用的 llm_model 為 None）
+        if llm_model is not None and store.meta.get('llm_model') not in (None, llm_model):
+            return None
+        scores, ids = store.index.search(normalize(self.embeddings.encode(text)), 1)
+        if ids[0][0] >= 0 and scores[0][0] >= self.threshold:
+            with self._lock:
+                self.hits += 1
+            return store.pairs[ids[0][0]]['output']
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def reload(self):
+        with self._lock:
+            self._stores.clear()
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'threshold': self.threshold,
+            'entries': {d: len(s.pairs) for d, s in self._stores.items() if s is not None},
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+        }
+
+
+_semantic_cache = None
+_semantic_lock = threading.Lock()
+
+
+def get_semantic_cache():
+    global _semantic_cache
+    with _semantic_lock:
+        if _semantic_cache is None:
+            _semantic_cache = SemanticCache(get_embedding_service())
+        return _semantic_cache
+
+
+# ==================== 離線建立 ====================
+def _translators():
+    """回傳 {方向: (不經快取的翻譯函式, LLM 模型名稱)}。"""
+    if SPEECH_DIR not in sys.path:
+        sys.path.append(SPEECH_DIR)
+    import llm_translate_to_natural
+    import translate_to_sign
+
+    return {
+        SIGN_TO_NATURAL: (llm_translate_to_natural._translate_to_natural, llm_translate_to_natural.LLM_MODEL),
+        NATURAL_TO_SIGN: (translate_to_sign._translate_sentence, translate_to_sign.LLM_MODEL),
+    }
+
+
+def _save(direction, pairs, embeddings, meta, cache_dir):
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp = tempfile.mkdtemp(dir=cache_dir, prefix='.tmp-')
+    with open(os.path.join(tmp, 'pairs.json'), 'w', encoding='utf-8') as f:
+        json.dump(pairs, f, ensure_ascii=False, indent=1)
+    np.save(os.path.join(tmp, 'embeddings.npy'), embeddings)
+    with open(os.path.join(tmp, 'meta.json'), 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False)
+    path = os.path.join(cache_dir, direction)
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(tmp, path)
+
+
+def build(directions=DIRECTIONS, from_script=False, workers=4, cache_dir=SEMANTIC_CACHE_DIR):
+    """預先翻譯所有劇本句子並存成語意快取。"""
+    from concurrent.futures import ThreadPoolExecutor, as_completed
+
+    service = get_embedding_service()
+    script = load_script_pairs()
+    translators = None if from_script else _translators()
+    for direction in directions:
+        entries = script[direction]
+        if not entries:
+            print(f"⚠️ {direction}: 沒有任何劇本句子")
+            continue
+        inputs = [text for text, _, _ in entries]
+        if from_script:
+            outputs = [reference for _, reference, _ in entries]
+            llm_model = None
+        else:
+            translate, llm_model = translators[direction]
+            t0 = time.perf_counter()
+            outputs = [None] * len(inputs)
+            failed = 0
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                futures = {pool.submit(translate, text): i for i, text in enumerate(inputs)}
+                for future in as_completed(futures):
+                    i = futures[future]
+                    try:
+                        outputs[i] = future.result()
+                    except Exception as e:  # 一句失敗（LLMUnavailable 等）不影響其他句子，已翻好的照常存檔
+                        failed += 1
+                        print(f"⚠️ 翻譯失敗（{inputs[i]}）：{e}")
+            print(f"ℹ️ {direction}: {len(inputs)} 句 LLM 翻譯耗時 {time.perf_counter() - t0:.1f} s，失敗 {failed} 句")
+        pairs = [{'input': text, 'output': output, 'source': source}
+                 for (text, _, source), output in zip(entries, outputs) if output]
+        embeddings = normalize(service.encode_batch([p['input'] for p in pairs]))
+        meta = {'embed_model': service.model_name, 'llm_model': llm_model, 'created': time.time()}
+        _save(direction, pairs, embeddings, meta, cache_dir)
+        print(f"✅ {direction}: 已存 {len(pairs)} 句語意快取")
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="語意翻譯快取工具")
+    sub = parser.add_subparsers(dest='cmd', required=True)
+
+    p_build = sub.add_parser('build', help='預先翻譯劇本句子並建立語意快取')
+    p_build.add_argument('--from-script', action='store_true', help='直接採用劇本中的對照翻譯，不呼叫 LLM')
+    p_build.add_argument('--directions', default=','.join(DIRECTIONS))
+    p_build.add_argument('--workers', type=int, default=4, help='同時進行的 LLM 請求數')
+
+    args = parser.parse_args(argv)
+    build(directions=args.directions.split(','), from_script=args.from_script, workers=args.workers)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,72 @@
+"""
+辨識迴圈用的固定大小視窗
+SequenceWindow：預先配置的 float32 環形緩衝，取最近 seq_len 個 frame 不需重建 list 或複製
+VoteWindow    ：只保留最近 N 個預測的投票視窗，長時間執行記憶體不會成長
+"""
+from collections import Counter, deque
+import numpy as np
+
+
+class SequenceWindow:
+    """
+    每個 frame 同時寫入 pos 與 pos + seq_len 兩個位置（鏡像），
+    因此最近 seq_len 個 frame 永遠是 buffer 裡一段連續的區間，view() 直接回傳 slice。
+    """
+
+    def __init__(self, seq_len, feat_dim):
+        self.seq_len = seq_len
+        self.feat_dim = feat_dim
+        self._buf = np.zeros((2 * seq_len, feat_dim), dtype=np.float32)
+        self._pos = 0
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    def is_full(self):
+        return self._count == self.seq_len
+
+    def append(self, feat):
+        self._buf[self._pos] = feat
+        self._buf[self._pos + self.seq_len] = feat
+        self._pos = (self._pos + 1) % self.seq_len
+        if self._count < self.seq_len:
+            self._count += 1
+
+    def clear(self):
+        # 不需清零：未滿之前不會被讀取
+        self._pos = 0
+        self._count = 0
+
+    def view(self):
+        """(seq_len, feat_dim)，由舊到新；為 buffer 的 view，下一次 append 之前有效。"""
+        return self._buf[self._pos:self._pos + self.seq_len]
+
+    def batch_view(self):
+        """(1, seq_len, feat_dim)，可直接餵給模型。"""
+        return self.view()[np.newaxis]
+
+
+class VoteWindow:
+    """最近 size 個預測的多數決。"""
+
+    def __init__(self, size=10):
+        self.size = size
+        self._votes = deque(maxlen=size)
+
+    def __len__(self):
+        return len(self._votes)
+
+    def is_full(self):
+        return len(self._votes) == self.size
+
+    def add(self, label_idx):
+        self._votes.append(int(label_idx))
+
+    def clear(self):
+        self._votes.clear()
+
+    def most_common(self):
+        if not self._votes:
+            return None
+        return Counter(self._votes).most_common(1)[0][0]
@@ -0,0 +1,58 @@
+"""
+手語對照字典（App/server/speech_recognition/sign_language_dic.txt）
+每行「自然中文 -> 手語語序」，與 AudioTranscriber.load_sign_language_dictionary 相同格式。
+不需載入 Whisper 就能使用，作為 LLM 無法使用時的降級翻譯。
+"""
+import difflib
+import os
+import threading
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DICTIONARY_PATH = os.path.join(BASE_DIR, 'App', 'server', 'speech_recognition', 'sign_language_dic.txt')
+
+
+def load_pairs(path=DICTIONARY_PATH):
+    """回傳 [(自然中文, 手語語序), ...]；檔案不存在時為空 list。"""
+    pairs = []
+    if not os.path.exists(path):
+        return pairs
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            if '->' not in line:
+                continue  # 略過空行與格式不正確的行
+            key, value = line.split('->', 1)
+            if key.strip() and value.strip():
+                pairs.append((key.strip(), value.strip()))
+    return pairs
+
+
+class SignDictionary:
+    def __init__(self, path=DICTIONARY_PATH, cutoff=0.5):
+        self.cutoff = cutoff
+        pairs = load_pairs(path)
+        self.to_sign = dict(pairs)
+        self.to_natural = {sign: natural for natural, sign in pairs}
+
+    def _lookup(self, table, text):
+        best_match = difflib.get_close_matches(text, table.keys(), n=1, cutoff=self.cutoff)
+        return table[best_match[0]] if best_match else None
+
+    def to_sign_language(self, text):
+        """與 AudioTranscriber.to_sign_language 相同：模糊比對整句，找不到就保留原句。"""
+        return self._lookup(self.to_sign, text) or text
+
+    def to_natural_language(self, sign_sequence):
+        """反向查表；找不到就回傳原本的手語語序。"""
+        return self._lookup(self.to_natural, sign_sequence) or sign_sequence
+
+
+_dictionary = None
+_dictionary_lock = threading.Lock()
+
+
+def get_sign_dictionary():
+    global _dictionary
+    with _dictionary_lock:
+        if _dictionary is None:
+            _dictionary = SignDictionary()
+        return _dictionary
@@ -0,0 +1,143 @@
+"""
+手語辨識模型的自訂層
+訓練時使用的自訂層定義，載入 .keras 模型時需透過 CUSTOM_OBJECTS 提供給 load_model。
+"""
+import tensorflow as tf
+from tensorflow.keras.layers import Layer
+from tensorflow.keras import layers
+
+
+class CustomLSTM(tf.keras.layers.LSTM):
+    def __init__(self, *args, **kwargs):
+        # Keras 3 可能不支援 time_major，先安全移除
+        kwargs.pop('time_major', None)
+        super().__init__(*args, **kwargs)
+
+
+class SelfAttention(tf.keras.layers.Layer):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.supports_masking = True
+
+    def build(self, input_shape):
+        d = int(input_shape[-1])
+        self.W = self.add_weight(
+            name="att_weight", shape=(d, 1),
+            initializer="glorot_uniform", trainable=True
+        )
+        self.b = self.add_weight(
+            name="att_bias", shape=(1,),
+            initializer="zeros", trainable=True
+        )
+        super().build(input_shape)
+
+    def call(self, x, mask=None):
+        # x: (batch, seq_len, d)
+        e = tf.nn.tanh(tf.tensordot(x, self.W, axes=[[2], [0]]) + self.b)
+
+        if mask is not None:
+            mask = tf.cast(mask, dtype=e.dtype)[:, :, tf.newaxis]
+            e = e - (1.0 - mask) * 1e9
+
+        alpha = tf.nn.softmax(e, axis=1)
+        context = x * alpha
+        return tf.reduce_sum(context, axis=1)
+
+    def compute_output_shape(self, input_shape):
+        # (batch, d)
+        return (input_shape[0], input_shape[2])
+
+    def compute_mask(self, inputs, mask=None):
+        return None
+
+
+class LearnablePositionEmbedding(Layer):
+    """
+    ✅ 跟訓練時一模一樣：
+    __init__(self, seq_len, d_model, **kwargs)
+    """
+    def __init__(self, seq_len, d_model, **kwargs):
+        super().__init__(**kwargs)
+        self.seq_len = seq_len
+        self.d_model = d_model
+
+    def build(self, input_shape):
+        self.pos_emb = self.add_weight(
+            name="pos_embedding",
+            shape=(self.seq_len, self.d_model),
+            initializer="random_normal",
+            trainable=True
+        )
+        super().build(input_shape)
+
+    def call(self, x):
+        pos = tf.expand_dims(self.pos_emb, axis=0)   # (1, seq_len, d_model)
+        return x + pos
+
+    # 可加可不加，Keras 沒寫也會從 __init__ 推 config
+    def get_config(self):
+        config = super().get_config()
+        config.update({
+            "seq_len": self.seq_len,
+            "d_model": self.d_model,
+        })
+        return config
+
+
+class TransformerEncoderBlock(layers.Layer):
+    """
+    ✅ 完全照你訓練時的版本：
+    __init__(self, d_model, num_heads, dff, dropout_rate=0.1, **kwargs)
+    """
+    def __init__(self, d_model, num_heads, dff, dropout_rate=0.1, **kwargs):
+        super().__init__(**kwargs)
+        self.d_model = d_model
+        self.num_heads = num_heads
+        self.dff = dff
+        self.dropout_rate = dropout_rate
+
+        self.mha = layers.MultiHeadAttention(num_heads=num_heads, key_dim=d_model)
+        self.norm1 = layers.LayerNormalization(epsilon=1e-6)
+
+        self.ffn_dense1 = layers.Dense(dff, activation="relu")
+        self.ffn_dense2 = layers.Dense(d_model)
+
+        self.norm2 = layers.LayerNormalization(epsilon=1e-6)
+
+        self.dropout1 = layers.Dropout(dropout_rate)
+        self.dropout2 = layers.Dropout(dropout_rate)
+
+    def call(self, x, training=False, mask=None):
+        attn_output = self.mha(
+            query=x,
+            value=x,
+            key=x,
+            attention_mask=mask
+        )
+        attn_output = self.dropout1(attn_output, training=training)
+        out1 = self.norm1(x + attn_output)
+
+        ffn_output = self.ffn_dense1(out1)
+        ffn_output = self.ffn_dense2(ffn_output)
+        ffn_output = self.dropout2(ffn_output, training=training)
+
+        out2 = self.norm2(out1 + ffn_output)
+        return out2
+
+    def get_config(self):
+        config = super().get_config()
+        config.update({
+            "d_model": self.d_model,
+            "num_heads": self.num_heads,
+            "dff": self.dff,
+            "dropout_rate": self.dropout_rate,
+        })
+        return config
+
+
+CUSTOM_OBJECTS = {
+    'SelfAttention': SelfAttention,
+    'CustomLSTM': CustomLSTM,
+    'LearnablePositionEmbedding': LearnablePositionEmbedding,
+    'TransformerEncoderBlock': TransformerEncoderBlock,
+}
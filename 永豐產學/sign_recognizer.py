@@ -0,0 +1,100 @@
+"""
+手語辨識狀態機（序列視窗、投票、句子、閒置清空）
+與影像來源無關：攝影機迴圈、多階段 pipeline 或前端上傳的關節點都共用同一套邏輯。
+"""
+import time
+import numpy as np
+
+from sequence_window import SequenceWindow, VoteWindow
+
+
+class SignRecognizer:
+    """
+    用法：
+        recognizer = SignRecognizer(sign_model, on_update=callback)
+        sentence = recognizer.push(keypoints)   # 有新詞時回傳整句（空白分隔），否則 None
+        recognizer.tick()                        # 每個 frame 呼叫，10 秒沒有新詞就清空
+
+    predict_fn 預設為 sign_model.predict，可換成跨 session 的 micro-batch scheduler.run。
+    需要自行排程推論時，改用
+        if recognizer.add_frame(keypoints): res = ...; recognizer.apply_prediction(res)
+    """
+
+    def __init__(self, sign_model, threshold=0.7, vote_size=10, max_words=5,
+                 idle_reset=10.0, on_update=None, predict_fn=None):
+        self.sign_model = sign_model
+        self.predict_fn = predict_fn or sign_model.predict
+        self.actions = sign_model.labels
+        self.threshold = threshold
+        self.max_words = max_words
+        self.idle_reset = idle_reset
+        self.on_update = on_update
+
+        self.sequence = SequenceWindow(sign_model.sequence_length, sign_model.feat_dim)
+        self.predictions = VoteWindow(vote_size)
+        self.sentence = []
+        self.trans_result = ""
+        self.last_updated_time = time.time()  # 最近一次「新增詞」的時間
+
+    def reset(self):
+        self.sequence.clear()
+        self.predictions.clear()
+        self.sentence = []
+        self.trans_result = ""
+
+    def add_frame(self, keypoints):
+        """加入一個 frame 的特徵；回傳視窗是否已滿（可以推論）。"""
+        if keypoints is not None and np.count_nonzero(keypoints) > 10:
+            self.sequence.append(keypoints)
+        return self.sequence.is_full()
+
+    def window(self):
+        """(1, seq_len, feat_dim) 的模型輸入（buffer 的 view，下一次 add_frame 前有效）。"""
+        return self.sequence.batch_view()
+
+    def apply_prediction(self, res):
+        """套用一次模型輸出 (num_classes,)；有新詞時回傳整句，否則 None。"""
+        best = int(np.argmax(res))
+        if res[best] > self.threshold:
+            self.predictions.add(best)
+
+        if not self.predictions.is_full() or self.predictions.most_common() != best:
+            return None
+
+        current_action = self.actions[best]
+        # 只有與最後一個不同時才加入
+        if self.sentence and current_action == self.sentence[-1]:
+            return None
+
+        self.sentence.append(current_action)
+        # 只保留最後 max_words 個詞
+        if len(self.sentence) > self.max_words:
+            self.sentence = self.sentence[-self.max_words:]
+        self.sequence.clear()  # 重置序列以開始收集下一段
+        self.last_updated_time = time.time()
+
+        self.trans_result = ' '.join(self.sentence)
+        print(f'---手語語序(更新)---: {self.trans_result}')
+        if self.on_update is not None:
+            self.on_update(self.trans_result)
+        return self.trans_result
+
+    def push(self, keypoints):
+        """加入一個 frame，視窗已滿時直接推論。"""
+        if not self.add_frame(keypoints):
+            return None
+        try:
+            res = self.predict_fn(self.window())[0]
+        except Exception as e:
+            print(f"❌ 預測錯誤: {e}")
+            return None
+        return self.apply_prediction(res)
+
+    def tick(self, now=None):
+        """動態清空：idle_reset 秒無更新就清空句子與序列；有清空時回傳 True。"""
+        now = time.time() if now is None else now
+        if self.sentence and now - self.last_updated_time >= self.idle_reset:
+            print(f"⏱️ {self.idle_reset:g}s 無更新，清空句子與序列")
+            self.reset()
+            return True
+        return False
@@ -0,0 +1,117 @@
+"""
+推測式翻譯：客戶還在比手語時就先翻譯目前的手語語序
+SignRecognizer 每辨識出一個新詞就 publish 一次完整的手語語序（SIGN_RESULT）。
+以前要等前端呼叫 /translateSign 才開始呼叫 LLM；現在每次語序變長就在背景翻譯目前這一段，
+並取消同一 session 還在進行中的舊翻譯（串流模式，停止讀取時遠端請求一併取消）。
+
+前端呼叫 /translateSign 時：
+    - 句子與最後一次推測相同且已翻完 → 直接回傳
+    - 句子相同但還在翻 → 等它翻完（已經花掉的時間不用再等一次）
+    - 其他情況 → 一般翻譯流程
+完成的推測結果也會寫入翻譯快取（translation_cache），因此多個 gunicorn worker 之間仍可沿用。
+
+SPECULATIVE_TRANSLATION=0 關閉；SPECULATIVE_WORKERS 為同時進行的推測翻譯數（預設 2）。
+"""
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from embedding_service import normalize_text
+
+ENABLED = os.getenv("SPECULATIVE_TRANSLATION", "1") != "0"
+WORKERS = int(os.getenv("SPECULATIVE_WORKERS", "2"))
+
+
+class _Job:
+    def __init__(self, sentence):
+        self.sentence = sentence
+        self.key = normalize_text(sentence)
+        self.result = None
+        self.cancelled = threading.Event()
+        self.done = threading.Event()
+
+
+class SpeculativeTranslator:
+    def __init__(self, translate, translate_stream, workers=WORKERS, max_sessions=64, enabled=ENABLED):
+        self.translate = translate                  # 一般（同步）翻譯，推測沒命中時使用
+        self.translate_stream = translate_stream    # 串流翻譯 fn(sentence, fallback)，推測用（可中途取消）
+        self.max_sessions = max_sessions
+        self.enabled = enabled
+        self._jobs = OrderedDict()   # session_id → 最新的 _Job
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='speculative')
+        self._counts = {'started': 0, 'cancelled': 0, 'failed': 0, 'completed': 0, 'served': 0, 'waited': 0, 'missed': 0}
+
+    # ==================== 推測 ====================
+    def submit(self, session_id, sentence):
+        """手語語序變長時呼叫（不會阻塞）：取消同 session 的舊推測並開始翻譯這一段。"""
+        if not self.enabled or not sentence or not sentence.strip():
+            return
+        job = _Job(sentence)
+        with self._lock:
+            old = self._jobs.get(session_id)
+            if old is not None and old.key == job.key:
+                return  # 同一句已經在翻或翻完了
+            if old is not None and not old.done.is_set():
+                old.cancelled.set()
+            self._jobs[session_id] = job
+            self._jobs.move_to_end(session_id)
+            while len(self._jobs) > self.max_sessions:
+                _, stale = self._jobs.popitem(last=False)
+                stale.cancelled.set()
+            self._counts['started'] += 1
+        self._pool.submit(self._run, job)
+
+    def _run(self, job):
+        if job.cancelled.is_set():  # 排隊時就已經被更新的句子取代
+            self._finish(job, None)
+            return
+        parts = []
+        finished = False
+        # fallback=False：LLM 失敗時不拿字典降級結果當推測結果，讓 /translateSign 重新走一般流程
+        stream = self.translate_stream(job.sentence, fallback=False)
+        try:
+            for piece in stream:
+                if job.cancelled.is_set():
+                    break
+                parts.append(piece)
+            else:
+                finished = True
+        except Exception as e:
+            print(f"⚠️ 推測翻譯失敗：{e}")
+        finally:
+            stream.close()  # 中途停止時連同 LLM 請求一起取消，未完成的結果不寫入快取
+        if job.cancelled.is_set():
+            self._finish(job, None, 'cancelled')
+        elif not finished:
+            self._finish(job, None, 'failed')
+        else:
+            self._finish(job, ''.join(parts).strip() or None, 'completed')
+
+    def _finish(self, job, result, outcome='cancelled'):
+        # 只有完整跑完的串流才保留結果；取消或失敗時 result 為 None，translate_final 改走一般翻譯
+        job.result = result
+        with self._lock:
+            self._counts[outcome] += 1
+        job.done.set()
+
+    # ==================== 取用 ====================
+    def translate_final(self, session_id, sentence, timeout=None):
+        """/translateSign 用：有相同句子的推測就沿用（必要時等它翻完），否則一般翻譯。"""
+        key = normalize_text(sentence)
+        with self._lock:
+            job = self._jobs.get(session_id)
+        if job is not None and job.key == key and not job.cancelled.is_set():
+            waited = not job.done.is_set()
+            if job.done.wait(timeout) and job.result is not None:
+                with self._lock:
+                    self._counts['waited' if waited else 'served'] += 1
+                return job.result
+        with self._lock:
+            self._counts['missed'] += 1
+        return self.translate(sentence)
+
+    def stats(self):
+        with self._lock:
+            return {'enabled': self.enabled, 'sessions': len(self._jobs), **self._counts}
@@ -0,0 +1,228 @@
+"""
+對話狀態儲存（訊息紀錄、讀取 cursor、單一值）
+    MemoryStateStore：process 內記憶體，單一 Flask process 時使用（預設）
+    SQLiteStateStore：本機 SQLite 檔（WAL 模式），多個 gunicorn worker 共用同一份狀態
+
+由環境變數 SIGN_STATE_STORE 選擇（路徑寫法同 SQLAlchemy：三個斜線是相對路徑，四個斜線是絕對路徑）：
+    SIGN_STATE_STORE=memory
+    SIGN_STATE_STORE=sqlite:///.rag_cache/sign_state.db     相對於目前目錄
+    SIGN_STATE_STORE=sqlite:////tmp/sign_state.db           絕對路徑 /tmp/sign_state.db
+注意：這裡只涵蓋訊息紀錄與 cursor；辨識 session、攝影機與 Whisper 模型仍是每個 process 各一份，
+因此 app 建議以單一 worker 執行，多個 worker 時那些路由需要 sticky session（見 README）。
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from message_log import MessageLog
+
+
+class StateStore:
+    def append(self, channel, session_id, data):
+        """新增一則訊息，回傳 seq。"""
+        raise NotImplementedError
+
+    def read(self, channel, session_id, since=0, limit=None):
+        """回傳 (seq 大於 since 的訊息, 下一次的 cursor)。"""
+        raise NotImplementedError
+
+    def last_seq(self, channel, session_id):
+        raise NotImplementedError
+
+    def read_unseen(self, channel, session_id, reader):
+        """以伺服器端保存的 reader cursor 讀取尚未讀過的訊息，並原子地前移 cursor。"""
+        raise NotImplementedError
+
+    def set_value(self, key, value):
+        raise NotImplementedError
+
+    def get_value(self, key, default=None):
+        raise NotImplementedError
+
+    def latest(self, channel, session_id):
+        messages, _ = self.read(channel, session_id, max(self.last_seq(channel, session_id) - 1, 0))
+        return messages[-1] if messages else None
+
+    def wait(self, channel, session_id, since=0, timeout=None):
+        """等到有新訊息或逾時，回傳 (messages, cursor)。"""
+        raise NotImplementedError
+
+
+class MemoryStateStore(StateStore):
+    def __init__(self, max_messages=256, max_sessions=128):
+        self.max_messages = max_messages
+        self.max_sessions = max_sessions
+        self._logs = {}
+        self._values = {}
+        self._cursors = {}
+        self._lock = threading.Lock()
+
+    def _log(self, channel):
+        with self._lock:
+            log = self._logs.get(channel)
+            if log is None:
+                log = self._logs[channel] = MessageLog(self.max_messages, self.max_sessions)
+            return log
+
+    def append(self, channel, session_id, data):
+        return self._log(channel).append(session_id, data)
+
+    def read(self, channel, session_id, since=0, limit=None):
+        return self._log(channel).read(session_id, since, limit)
+
+    def last_seq(self, channel, session_id):
+        return self._log(channel).last_seq(session_id)
+
+    def latest(self, channel, session_id):
+        return self._log(channel).latest(session_id)
+
+    def read_unseen(self, channel, session_id, reader):
+        log = self._log(channel)
+        with self._lock:
+            key = (channel, session_id, reader)
+            cursor = self._cursors.get(key, 0)
+            if cursor > log.last_seq(session_id):
+                cursor = 0  # session 紀錄已被淘汰後重建
+            messages, cursor = log.read(session_id, cursor)
+            self._cursors[key] = cursor
+        return messages, cursor
+
+    def set_value(self, key, value):
+        self._values[key] = value
+
+    def get_value(self, key, default=None):
+        return self._values.get(key, default)
+
+    def wait(self, channel, session_id, since=0, timeout=None):
+        return self._log(channel).wait(session_id, since, timeout)
+
+
+class SQLiteStateStore(StateStore):
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS messages (
+        channel TEXT NOT NULL, session TEXT NOT NULL, seq INTEGER NOT NULL,
+        time REAL NOT NULL, data TEXT NOT NULL,
+        PRIMARY KEY (channel, session, seq)
+    );
+    CREATE TABLE IF NOT EXISTS cursors (
+        channel TEXT NOT NULL, session TEXT NOT NULL, reader TEXT NOT NULL, seq INTEGER NOT NULL,
+        PRIMARY KEY (channel, session, reader)
+    );
+    CREATE TABLE IF NOT EXISTS kv (key TEXT PRIMARY KEY, value TEXT);
+    """
+
+    def __init__(self, path, max_messages=256, poll_interval=0.1):
+        self.path = path
+        self.max_messages = max_messages
+        self.poll_interval = poll_interval
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn().executescript(self.SCHEMA)
+
+    def _conn(self):
+        # sqlite3 連線不能跨 thread 共用：每個 thread 一條
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _last_seq(self, conn, channel, session_id):
+        row = conn.execute("SELECT MAX(seq) FROM messages WHERE channel=? AND session=?",
+                           (channel, session_id)).fetchone()
+        return row[0] or 0
+
+    def append(self, channel, session_id, data):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            seq = self._last_seq(conn, channel, session_id) + 1
+            now = time.time()
+            conn.execute("INSERT INTO messages VALUES (?, ?, ?, ?, ?)",
+                         (channel, session_id, seq, now, json.dumps(data, ensure_ascii=False)))
+            # 每個 session 只保留最近 max_messages 則
+            conn.execute("DELETE FROM messages WHERE channel=? AND session=? AND seq<=?",
+                         (channel, session_id, seq - self.max_messages))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return seq
+
+    def _read(self, conn, channel, session_id, since, limit):
+        rows = conn.execute(
+            "SELECT seq, time, data FROM messages WHERE channel=? AND session=? AND seq>? "
+            "ORDER BY seq LIMIT ?",
+            (channel, session_id, since, -1 if limit is None else limit)).fetchall()
+        messages = [{'seq': seq, 'time': t, **json.loads(data)} for seq, t, data in rows]
+        cursor = messages[-1]['seq'] if messages else max(since, 0)
+        return messages, cursor
+
+    def read(self, channel, session_id, since=0, limit=None):
+        return self._read(self._conn(), channel, session_id, since, limit)
+
+    def last_seq(self, channel, session_id):
+        return self._last_seq(self._conn(), channel, session_id)
+
+    def read_unseen(self, channel, session_id, reader):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT seq FROM cursors WHERE channel=? AND session=? AND reader=?",
+                               (channel, session_id, reader)).fetchone()
+            cursor = row[0] if row else 0
+            if cursor > self._last_seq(conn, channel, session_id):
+                cursor = 0
+            messages, cursor = self._read(conn, channel, session_id, cursor, None)
+            conn.execute("INSERT OR REPLACE INTO cursors VALUES (?, ?, ?, ?)",
+                         (channel, session_id, reader, cursor))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return messages, cursor
+
+    def set_value(self, key, value):
+        self._conn().execute("INSERT OR REPLACE INTO kv VALUES (?, ?)",
+                             (key, json.dumps(value, ensure_ascii=False)))
+
+    def get_value(self, key, default=None):
+        row = self._conn().execute("SELECT value FROM kv WHERE key=?", (key,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def wait(self, channel, session_id, since=0, timeout=None):
+        # 其他 process 寫入無法通知，改用短間隔輪詢本機 SQLite（不經網路，成本很低）
+        deadline = None if timeout is None else time.time() + timeout
+        while True:
+            messages, cursor = self.read(channel, session_id, since)
+            if messages or (deadline is not None and time.time() >= deadline):
+                return messages, cursor
+            time.sleep(self.poll_interval)
+
+
+def sse_stream(store, channel, session_id, since=0, event='message', keepalive=15.0):
+    """把 session 的訊息轉成 text/event-stream；id 為 seq，可用 Last-Event-ID 續傳。"""
+    yield ': connected\n\n'
+    cursor = since
+    while True:
+        messages, cursor = store.wait(channel, session_id, cursor, timeout=keepalive)
+        if not messages:
+            yield ': keepalive\n\n'
+            continue
+        for m in messages:
+            payload = json.dumps(m, ensure_ascii=False)
+            yield f'id: {m["seq"]}\nevent: {event}\ndata: {payload}\n\n'
+
+
+def create_state_store(spec=None):
+    spec = spec or os.getenv("SIGN_STATE_STORE", "memory")
+    if spec == "memory":
+        return MemoryStateStore()
+    if spec.startswith("sqlite:///"):
+        # sqlite:///rel/path → rel/path；sqlite:////abs/path → /abs/path
+        return SQLiteStateStore(spec[len("sqlite:///"):])
+    raise ValueError(f"不支援的 SIGN_STATE_STORE：{spec}")
@@ -0,0 +1,67 @@
+"""
+推測式翻譯取消串流時不能讓 LLM circuit breaker 卡在 half-open（不需要連網，LLM 以假的 AsyncOpenAI 代替）
+    python -m pytest test_speculative_translation.py
+"""
+import asyncio
+import time
+from types import SimpleNamespace
+
+from llm_client import CircuitBreaker, LLMClient
+from speculative_translation import SpeculativeTranslator
+
+
+class FakeCompletions:
+    """每 50 ms 串流一個字，模擬 OpenAI 相容的 chat.completions.create(stream=True)。"""
+
+    def __init__(self, reply):
+        self.reply = reply
+        self.chat = SimpleNamespace(completions=self)
+
+    async def create(self, model, messages, stream=False):
+        async def chunks():
+            for ch in self.reply:
+                await asyncio.sleep(0.05)
+                yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=ch))])
+        return chunks()
+
+
+def _client(breaker):
+    client = LLMClient(api_key='test', base_url='http://127.0.0.1:0/v1', timeout=2.0,
+                       max_concurrency=2, breaker=breaker)
+
+    async def install():
+        client._client = FakeCompletions("您好歡迎光臨")
+        client._semaphore = asyncio.Semaphore(client.max_concurrency)
+
+    asyncio.run_coroutine_threadsafe(install(), client._loop).result()
+    return client
+
+
+def _wait_until(predicate, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not predicate() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return predicate()
+
+
+def test_cancelled_half_open_probe_does_not_stick_breaker():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+    client = _client(breaker)
+    speculator = SpeculativeTranslator(
+        lambda sentence: "SYNC",
+        lambda sentence, fallback=True: client.stream('test', [{'role': 'user', 'content': sentence}]),
+        workers=2)
+
+    breaker.record_failure()
+    time.sleep(0.06)  # reset_timeout 已過：下一個請求是 half-open 的試探
+    speculator.submit('s1', '我 申請')
+    assert _wait_until(lambda: breaker.state == CircuitBreaker.HALF_OPEN)
+
+    # 較新的語序取代舊的推測：舊的串流（也就是試探請求）被取消
+    speculator.submit('s1', '我 申請 存摺')
+    assert _wait_until(lambda: speculator.stats()['cancelled'] == 1)
+    assert _wait_until(lambda: breaker.state != CircuitBreaker.HALF_OPEN)
+
+    # breaker 恢復：之後的請求可以正常完成
+    assert ''.join(client.stream('test', [])) == "您好歡迎光臨"
+    assert breaker.state == CircuitBreaker.CLOSED
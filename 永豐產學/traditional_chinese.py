@@ -0,0 +1,250 @@
+"""
+LLM 回覆的繁體中文後處理（取代逐詞 langdetect + GoogleTranslator 的做法）
+以前每個不是純中文的詞都要跑一次 langdetect，必要時再各自發一次 HTTP 請求翻譯，
+而且每次呼叫都新建一個 translator，一段回覆可能串行打 N 次網路。
+
+現在：
+1. 用預先編好的 Unicode 範圍 regex 一次掃出外文片段（拉丁字母、假名、韓文…），不做語言偵測
+2. 所有外文片段「一次」交給可替換的 FragmentTranslator 翻譯，每個片段的結果都會快取
+3. 最後整段字串只跑一次 zhconv 轉繁體
+
+翻譯器由環境變數 SCRIPT_TRANSLATOR 選擇：
+    offline：離線字典（SCRIPT_DICTIONARY_PATH 可另外指定「外文 -> 中文」對照檔），查不到就保留原文（預設，不連網）
+    noop   ：不翻譯，只轉繁體
+    google ：deep_translator 的 GoogleTranslator，所有片段合併成一次請求；需要翻譯任意外文時才指定（會連網）
+"""
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Tuple
+
+# 視為中文內容、不需翻譯的字元：空白、數字、CJK 標點、漢字、全形符號、一般標點
+_NATIVE = (r'\s\d'
+           r'\u2000-\u206f'   # 一般標點（…、—）
+           r'\u3000-\u303f'   # CJK 標點（，。、「」）
+           r'\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff'  # 漢字
+           r'\uff00-\uffef'   # 全形符號
+           r'!-/:-@\[-`{-~')  # ASCII 標點
+# 外文片段：連續的非中文字元，中間允許以空白、撇號或連字號連接（例如 "thank you"、"e-mail"）
+FOREIGN_RE = re.compile(rf"[^{_NATIVE}]+(?:[ '\u2019-]+[^{_NATIVE}]+)*")
+
+# 片段的語言（取代 langdetect，只用第一個字元的 Unicode 範圍判斷）；
+# 代碼沿用 langdetect 的寫法，翻譯紀錄的 detected_lang 與以前相同（拉丁字母一律視為英文）
+_SCRIPTS = (
+    ('en', re.compile(r'[A-Za-z\u00c0-\u024f]')),
+    ('ja', re.compile(r'[\u3040-\u30ff]')),
+    ('ko', re.compile(r'[\u1100-\u11ff\uac00-\ud7af]')),
+    ('ru', re.compile(r'[\u0400-\u04ff]')),
+)
+
+# 櫃台常見的英文詞（小寫 key）
+DEFAULT_DICTIONARY = {
+    'ok': '好',
+    'okay': '好',
+    'yes': '是',
+    'no': '不',
+    'hello': '您好',
+    'hi': '您好',
+    'thank you': '謝謝',
+    'thanks': '謝謝',
+    'sorry': '抱歉',
+    'please': '請',
+    'bank': '銀行',
+    'account': '帳戶',
+    'passbook': '存摺',
+    'id card': '身分證',
+    'sign': '簽名',
+    'signature': '簽名',
+    'deposit': '存款',
+    'withdraw': '提款',
+    'online banking': '網路銀行',
+}
+
+
+def detect_lang(fragment):
+    for lang, pattern in _SCRIPTS:
+        if pattern.match(fragment):
+            return lang
+    return 'unknown'
+
+
+# ==================== 翻譯器 ====================
+class FragmentTranslator:
+    name = None
+
+    def translate_batch(self, fragments: List[str]) -> List[str]:
+        """回傳與 fragments 等長的翻譯結果；無法翻譯的片段原樣回傳。"""
+        raise NotImplementedError
+
+
+class NoopTranslator(FragmentTranslator):
+    name = 'noop'
+
+    def translate_batch(self, fragments):
+        return list(fragments)
+
+
+class DictionaryTranslator(FragmentTranslator):
+    name = 'offline'
+
+    def __init__(self, dictionary=None, fallback=None):
+        self.dictionary = {k.lower(): v for k, v in (dictionary or DEFAULT_DICTIONARY).items()}
+        self.fallback = fallback
+
+    @classmethod
+    def from_file(cls, path, fallback=None):
+        # 格式與 sign_language_dic.txt 相同：每行「外文 -> 中文」
+        dictionary = dict(DEFAULT_DICTIONARY)
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                if '->' in line:
+                    key, value = line.split('->', 1)
+                    dictionary[key.strip()] = value.strip()
+        return cls(dictionary, fallback)
+
+    def translate_batch(self, fragments):
+        out = [self.dictionary.get(f.lower()) for f in fragments]
+        missing = [i for i, t in enumerate(out) if t is None]
+        if missing and self.fallback is not None:
+            for i, t in zip(missing, self.fallback.translate_batch([fragments[i] for i in missing])):
+                out[i] = t
+        return [f if t is None else t for f, t in zip(fragments, out)]
+
+
+class GoogleBatchTranslator(FragmentTranslator):
+    name = 'google'
+
+    def __init__(self, target='zh-TW'):
+        from deep_translator import GoogleTranslator
+
+        self._translator = GoogleTranslator(source='auto', target=target)  # 只建立一次
+
+    def translate_batch(self, fragments):
+        # 以換行合併成一次請求；行數對不上時才退回逐筆
+        try:
+            joined = self._translator.translate('\n'.join(fragments))
+            lines = joined.split('\n') if joined else []
+            if len(lines) == len(fragments):
+                return [line.strip() or f for line, f in zip(lines, fragments)]
+            return [self._translator.translate(f) or f for f in fragments]
+        except Exception as e:
+            print(f"⚠️ 外文片段翻譯失敗，保留原文: {e}")
+            return list(fragments)
+
+
+def create_translator(name=None):
+    name = name or os.getenv("SCRIPT_TRANSLATOR", "offline")
+    if name == 'noop':
+        return NoopTranslator()
+    if name == 'google':
+        return GoogleBatchTranslator()
+    if name == 'offline':
+        path = os.getenv("SCRIPT_DICTIONARY_PATH")
+        return DictionaryTranslator.from_file(path) if path else DictionaryTranslator()
+    raise ValueError(f"不支援的 SCRIPT_TRANSLATOR：{name}")
+
+
+# ==================== 轉換 ====================
+class TraditionalChineseConverter:
+    def __init__(self, translator=None, cache_size=4096):
+        self.translator = translator or create_translator()
+        self.cache_size = cache_size
+        self._cache = OrderedDict()   # 片段 → 翻譯
+        self._lock = threading.Lock()
+
+    def _translate(self, fragments):
+        results = {}
+        with self._lock:
+            for f in fragments:
+                if f in self._cache:
+                    self._cache.move_to_end(f)
+                    results[f] = self._cache[f]
+        missing = [f for f in dict.fromkeys(fragments) if f not in results]
+        if missing:
+            translated = self.translator.translate_batch(missing)
+            with self._lock:
+                for f, t in zip(missing, translated):
+                    results[f] = t
+                    self._cache[f] = t
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return results
+
+    def convert(self, text: str) -> Tuple[str, List[Dict[str, str]]]:
+        """回傳 (繁體中文字串, 翻譯紀錄)；紀錄格式與舊版相同：original / translated / detected_lang。"""
+        from zhconv import convert
+
+        matches = list(FOREIGN_RE.finditer(text))
+        records = []
+        if matches:
+            translated = self._translate([m.group() for m in matches])
+            parts = []
+            last = 0
+            for m in matches:
+                original = m.group()
+                trans = translated[original]
+                parts.append(text[last:m.start()])
+                parts.append(trans)
+                last = m.end()
+                if trans != original:
+                    records.append({'original': original, 'translated': trans,
+                                    'detected_lang': detect_lang(original)})
+            parts.append(text[last:])
+            text = ''.join(parts)
+        return convert(text, 'zh-hant'), records
+
+
+class StreamingConverter:
+    """
+    串流版：LLM 每送來一段就轉換一段。
+    結尾若可能是還沒講完的外文片段（例如 "thank y"）先保留，等下一段再一起翻譯。
+    """
+    _TAIL_RE = re.compile(r"[ '\u2019-]*$")
+
+    def __init__(self, converter=None):
+        self.converter = converter or get_converter()
+        self.records = []
+        self._pending = ''
+        self._started = False   # 開頭的空白不送出（與非串流版的 strip() 一致）
+
+    def feed(self, delta: str) -> str:
+        text = self._pending + delta
+        split = len(text)
+        last = None
+        for last in FOREIGN_RE.finditer(text):
+            pass
+        if last is not None and self._TAIL_RE.fullmatch(text, last.end()):
+            split = last.start()
+        self._pending = text[split:]
+        return self._convert(text[:split])
+
+    def flush(self) -> str:
+        text, self._pending = self._pending, ''
+        return self._convert(text)
+
+    def _convert(self, text):
+        if not text:
+            return ''
+        converted, records = self.converter.convert(text)
+        self.records.extend(records)
+        if not self._started:
+            converted = converted.lstrip()
+            self._started = bool(converted)
+        return converted
+
+
+_converter = None
+_converter_lock = threading.Lock()
+
+
+def get_converter():
+    global _converter
+    with _converter_lock:
+        if _converter is None:
+            _converter = TraditionalChineseConverter()
+        return _converter
+
+
+def ensure_traditional_chinese(text: str) -> Tuple[str, List[Dict[str, str]]]:
+    return get_converter().convert(text)
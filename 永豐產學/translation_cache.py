@@ -0,0 +1,207 @@
+"""
+LLM 翻譯結果快取（兩個方向共用）
+同一句話（例如「我 申請 存摺」）每天在櫃台出現幾十次，每次都呼叫遠端 LLM
+要等數百毫秒到數秒、還要付 token 費用。完全相同的輸入直接回傳上次的結果。
+
+key = (方向, 正規化後的輸入, LLM 模型名稱, 語料版本)，任一改變就視為不同的翻譯。
+兩層：
+    記憶體 LRU（TRANSLATION_CACHE_MEMORY_SIZE，預設 512 筆）
+    SQLite 檔（TRANSLATION_CACHE_PATH，預設 .rag_cache/translations.sqlite3），
+        重啟後仍有效、多個 worker 共用；超過 TTL（TRANSLATION_CACHE_TTL 秒，預設 7 天）視為過期，
+        超過 TRANSLATION_CACHE_MAX_ROWS 筆時淘汰最久沒用到的
+TRANSLATION_CACHE_PATH 設為空字串時只用記憶體。
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from embedding_service import normalize_text
+from rag_index import RAG_CACHE_DIR
+
+# 翻譯方向
+SIGN_TO_NATURAL = 'sign_to_natural'   # 手語語序 → 自然中文（llm_translate_to_natural.py）
+NATURAL_TO_SIGN = 'natural_to_sign'   # 自然中文 → 手語語序（translate_to_sign.py）
+
+DEFAULT_PATH = os.path.join(RAG_CACHE_DIR, 'translations.sqlite3')
+MEMORY_SIZE = int(os.getenv("TRANSLATION_CACHE_MEMORY_SIZE", "512"))
+TTL_SECONDS = float(os.getenv("TRANSLATION_CACHE_TTL", str(7 * 24 * 3600)))
+MAX_ROWS = int(os.getenv("TRANSLATION_CACHE_MAX_ROWS", "50000"))
+
+
+def cache_key(direction, text, model, corpus_version):
+    raw = json.dumps([direction, normalize_text(text), model, corpus_version], ensure_ascii=False)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+class TranslationCache:
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS translations (
+        key TEXT PRIMARY KEY, direction TEXT NOT NULL, input TEXT NOT NULL, output TEXT NOT NULL,
+        model TEXT, corpus_version TEXT, created REAL NOT NULL, accessed REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS translations_accessed ON translations (accessed);
+    """
+
+    def __init__(self, path=DEFAULT_PATH, memory_size=MEMORY_SIZE, ttl=TTL_SECONDS,
+                 max_rows=MAX_ROWS, evict_every=100):
+        self.path = path
+        self.memory_size = memory_size
+        self.ttl = ttl
+        self.max_rows = max_rows
+        self.evict_every = evict_every
+        self._memory = OrderedDict()   # key → (output, created)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._puts = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        if self.path:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            self._conn().executescript(self.SCHEMA)
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _expired(self, created, now):
+        return self.ttl is not None and now - created > self.ttl
+
+    def _remember(self, key, output, created):
+        with self._lock:
+            self._memory[key] = (output, created)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_size:
+                self._memory.popitem(last=False)
+
+    # ==================== 讀寫 ====================
+    def get(self, direction, text, model, corpus_version):
+        """有未過期的結果就回傳，否則 None。"""
+        key = cache_key(direction, text, model, corpus_version)
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and not self._expired(entry[1], now):
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return entry[0]
+            self._memory.pop(key, None)
+
+        if self.path:
+            try:
+                conn = self._conn()
+                row = conn.execute("SELECT output, created FROM translations WHERE key=?", (key,)).fetchone()
+                if row is not None and not self._expired(row[1], now):
+                    conn.execute("UPDATE translations SET accessed=? WHERE key=?", (now, key))
+                    self._remember(key, row[0], row[1])
+                    with self._lock:
+                        self.disk_hits += 1
+                    return row[0]
+                if row is not None:
+                    conn.execute("DELETE FROM translations WHERE key=?", (key,))
+            except sqlite3.Error as e:
+                print(f"⚠️ 讀取翻譯快取失敗: {e}")
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, direction, text, model, corpus_version, output):
+        key = cache_key(direction, text, model, corpus_version)
+        now = time.time()
+        self._remember(key, output, now)
+        if not self.path:
+            return
+        try:
+            conn = self._conn()
+            conn.execute("INSERT OR REPLACE INTO translations VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                         (key, direction, normalize_text(text), output, model, corpus_version, now, now))
+            with self._lock:
+                self._puts += 1
+                evict = self._puts % self.evict_every == 0
+            if evict:
+                self.evict(now)
+        except sqlite3.Error as e:
+            print(f"⚠️ 寫入翻譯快取失敗: {e}")
+
+    def get_or_compute(self, direction, text, model, corpus_version, compute):
+        """快取命中就直接回傳；否則呼叫 compute() 並把結果存起來。"""
+        output = self.get(direction, text, model, corpus_version)
+        if output is None:
+            output = compute()
+            if output:
+                self.put(direction, text, model, corpus_version, output)
+        return output
+
+    def get_or_stream(self, direction, text, model, corpus_version, stream):
+        """
+        串流版的 get_or_compute：命中時一次 yield 整段結果；
+        否則逐段轉送 stream() 的輸出，完整結束後才把組好的全文寫入快取（中途失敗不寫入）。
+        """
+        output = self.get(direction, text, model, corpus_version)
+        if output is not None:
+            yield output
+            return
+        parts = []
+        for piece in stream():
+            parts.append(piece)
+            yield piece
+        output = ''.join(parts).strip()
+        if output:
+            self.put(direction, text, model, corpus_version, output)
+
+    def evict(self, now=None):
+        """刪除過期的資料，並把筆數壓回 max_rows 以內（先淘汰最久沒用到的）。"""
+        if not self.path:
+            return
+        now = now or time.time()
+        conn = self._conn()
+        if self.ttl is not None:
+            conn.execute("DELETE FROM translations WHERE created<?", (now - self.ttl,))
+        conn.execute("DELETE FROM translations WHERE key IN ("
+                     "SELECT key FROM translations ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+                     (self.max_rows,))
+
+    # ==================== 統計 ====================
+    def stats(self):
+        total = self.memory_hits + self.disk_hits + self.misses
+        stats = {
+            'memory_size': len(self._memory),
+            'memory_hits': self.memory_hits,
+            'disk_hits': self.disk_hits,
+            'misses': self.misses,
+            'hit_rate': (self.memory_hits + self.disk_hits) / total if total else 0.0,
+            'ttl_s': self.ttl,
+        }
+        if self.path:
+            try:
+                stats['disk_rows'] = self._conn().execute("SELECT COUNT(*) FROM translations").fetchone()[0]
+            except sqlite3.Error:
+                pass
+        return stats
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_translation_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            path = os.getenv("TRANSLATION_CACHE_PATH", DEFAULT_PATH)
+            try:
+                _cache = TranslationCache(path)
+            except (OSError, sqlite3.Error) as e:
+                print(f"⚠️ 無法開啟翻譯快取檔，只使用記憶體快取：{e}")
+                _cache = TranslationCache(None)
+        return _cache